@@ -2,6 +2,7 @@ import React, { useEffect, useState, useMemo } from "react";
 import { ActivityIndicator, ScrollView, Text, View, Linking, Alert, TouchableOpacity } from "react-native";
 import { useLocalSearchParams, useRouter } from "expo-router";
 import Constants from "expo-constants";
+import { getJSON } from "../lib/api";
 
 // ✅ NEW: Hide from tab bar
 export const unstable_settings = { href: null };
@@ -56,12 +57,7 @@ export default function Results() {
             (async () => {
                 try {
                     setLoading(true);
-                    const res = await fetch(`${API_BASE}/saved-reports/${reportId}`);
-                    if (!res.ok) {
-                        const detail = await res.text().catch(() => "");
-                        throw new Error(`HTTP ${res.status} ${detail}`);
-                    }
-                    const json = await res.json();
+                    const json = await getJSON<Report>(`${API_BASE}/saved-reports/${reportId}`);
                     setReport(json);
                 } catch (e: any) {
                     setErr(e.message || "Failed to load saved report");
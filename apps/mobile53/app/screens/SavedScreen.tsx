@@ -3,6 +3,7 @@ import { View, Text, StyleSheet, ScrollView, TouchableOpacity, ActivityIndicator
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { useRouter } from 'expo-router';
 import Constants from 'expo-constants';
+import { getJSON } from '../../lib/api';
 import { Gesture, GestureDetector, GestureHandlerRootView } from 'react-native-gesture-handler';
 import Animated, { useAnimatedStyle, useSharedValue, withTiming } from 'react-native-reanimated';
 
@@ -59,12 +60,7 @@ export default function SavedScreen() {
             }
             setError(null);
 
-            const response = await fetch(`${API_BASE}/saved-reports?limit=${limit}&offset=${offset}`);
-            if (!response.ok) {
-                throw new Error(`HTTP ${response.status}: ${await response.text()}`);
-            }
-
-            const data: SavedReportsResponse = await response.json();
+            const data = await getJSON<SavedReportsResponse>(`${API_BASE}/saved-reports?limit=${limit}&offset=${offset}`);
 
             if (append) {
                 setReports(prev => {
@@ -36,3 +36,23 @@ export async function analyze(url: string, locale = "en", maxClaims = 8): Promis
     if (!res.ok) throw new Error(await res.text());
     return res.json();
 }
+
+// ETag-aware GET: replays the cached body on 304 so repeat views of saved
+// reports don't re-download them.
+const etagCache = new Map<string, { etag: string; body: unknown }>();
+
+export async function getJSON<T>(url: string): Promise<T> {
+    const cached = etagCache.get(url);
+    const res = await fetch(url, {
+        headers: cached ? { "If-None-Match": cached.etag } : undefined,
+    });
+    if (res.status === 304 && cached) return cached.body as T;
+    if (!res.ok) {
+        const detail = await res.text().catch(() => "");
+        throw new Error(`HTTP ${res.status} ${detail}`);
+    }
+    const body = await res.json();
+    const etag = res.headers.get("ETag");
+    if (etag) etagCache.set(url, { etag, body });
+    return body as T;
+}
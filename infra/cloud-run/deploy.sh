@@ -5,7 +5,9 @@ REGION=us-central1
 PROJECT=${1:?"gcloud project id required"}
 
 gcloud config set project "$PROJECT"
-gcloud builds submit ./services/api --tag gcr.io/$PROJECT/claimlens-api
+# Optional ClaimReview feed: baked into the image as the local fact-check index, then refreshed daily
+gcloud builds submit ./services/api --config infra/cloud-run/cloudbuild.yaml \
+  --substitutions _FACTCHECK_FEED_URL="${FACTCHECK_FEED_URL:-}"
 
 gcloud run deploy $SERVICE \
   --image gcr.io/$PROJECT/claimlens-api \
@@ -35,4 +35,56 @@ create table if not exists claim_sources (
   url text
 );
 
-create index on analyses (video_id, created_at desc);
\ No newline at end of file
+create index on analyses (video_id, created_at desc);
+-- Saved reports as written by the API (one jsonb document per analysis)
+create table if not exists reports (
+  id uuid primary key,
+  video_id text,
+  data jsonb not null,
+  created_at timestamptz default now()
+);
+
+create index if not exists reports_video_created_idx on reports (video_id, created_at desc);
+create index if not exists reports_created_idx on reports (created_at desc);
+
+-- Full-text search over title, channel, summaries and claim text (GET /search)
+create extension if not exists pg_trgm;
+
+alter table reports add column if not exists search_doc tsvector generated always as (
+  setweight(to_tsvector('english', coalesce(data->'video'->>'title', '')), 'A') ||
+  setweight(to_tsvector('english', coalesce(data->'video'->>'channel', '')), 'B') ||
+  setweight(to_tsvector('english', coalesce(data->>'videoSummary', '') || ' ' || coalesce(data->'consensus'->>'summary', '')), 'C') ||
+  setweight(to_tsvector('english', coalesce(jsonb_path_query_array(data, '$.claims[*].text')::text, '')), 'D')
+) stored;
+
+alter table reports add column if not exists search_title text generated always as (
+  lower(coalesce(data->'video'->>'title', '') || ' ' || coalesce(data->'video'->>'channel', ''))
+) stored;
+
+create index if not exists reports_search_doc_idx on reports using gin (search_doc);
+create index if not exists reports_search_title_trgm_idx on reports using gin (search_title gin_trgm_ops);
+-- claim rating filter: data->'claims' @> '[{"rating": "..."}]'
+create index if not exists reports_claims_idx on reports using gin ((data->'claims') jsonb_path_ops);
+
+-- Ranked search with keyset pagination on (rank desc, id desc)
+create or replace function search_reports(
+  q text,
+  rating text default null,
+  after_rank real default null,
+  after_id text default null,
+  lim int default 10
+)
+returns table (id uuid, data jsonb, video_id text, created_at timestamptz, rank real)
+language sql stable as $$
+  select * from (
+    select r.id, r.data, r.video_id, r.created_at,
+           round((ts_rank_cd(r.search_doc, tsq) + word_similarity(lower(q), r.search_title))::numeric, 6)::real as rank
+    from reports r, websearch_to_tsquery('english', q) as tsq
+    -- <% compares q against the closest run of words in the title, so short queries still match
+    where (r.search_doc @@ tsq or lower(q) <% r.search_title)
+      and (rating is null or r.data->'claims' @> jsonb_build_array(jsonb_build_object('rating', rating)))
+  ) hits
+  where after_rank is null or (hits.rank, hits.id::text) < (after_rank, after_id)
+  order by hits.rank desc, hits.id::text desc
+  limit lim
+$$;
@@ -0,0 +1,110 @@
+# services/api/bench/cascade_eval.py
+"""
+Replay recorded claims through the primary-only and cascade verification paths.
+
+    VERIFY_RECORD_PATH=claims.jsonl uvicorn claimlens.main:app   # record
+    python -m bench.cascade_eval claims.jsonl --concurrency 4       # replay
+
+Reports rating agreement with the primary-only path, escalation rate,
+latency and estimated cost (tiktoken counts x --price per 1M tokens).
+"""
+import argparse, asyncio, json, time
+import tiktoken
+from claimlens.deps import get_settings
+from claimlens.pipeline import verify_with_snippets, verify_prompt
+from claimlens.prompts import VERIFY_SYSTEM
+
+LEVELS = ["doubtful", "mixed", "reliable", "solid"]
+DEFAULT_PRICES = {"gpt-4o": (2.50, 10.00), "gpt-4o-mini": (0.15, 0.60), "gpt-3.5-turbo": (0.50, 1.50)}
+
+def _encoder(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def _cost(model: str, prompt: str, result: dict, prices: dict) -> float:
+    enc = _encoder(model)
+    p_in, p_out = prices.get(model, (0.0, 0.0))
+    tokens_in = len(enc.encode(VERIFY_SYSTEM + prompt))
+    tokens_out = len(enc.encode(json.dumps({k: result.get(k) for k in ("rating", "rationale", "sources")})))
+    return (tokens_in * p_in + tokens_out * p_out) / 1e6
+
+def _pct(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))] if ordered else 0.0
+
+async def _replay(rec: dict, sem: asyncio.Semaphore, prices: dict) -> dict:
+    s = get_settings()
+    claim, snippets = rec["claim"], rec.get("snippets") or []
+    async with sem:
+        t0 = time.perf_counter()
+        primary = await verify_with_snippets(claim, snippets, cascade=False)
+        t1 = time.perf_counter()
+        cascade = await verify_with_snippets(claim, snippets, cascade=True)
+        t2 = time.perf_counter()
+
+    escalated = cascade.get("model") == s.MODEL_PRIMARY
+    cost_primary = _cost(s.MODEL_PRIMARY, verify_prompt(claim, snippets), primary, prices)
+    cost_cascade = _cost(s.MODEL_CASCADE, verify_prompt(claim, snippets, with_confidence=True), cascade, prices)
+    if escalated:
+        cost_cascade += cost_primary
+    return {
+        "primary": primary["rating"], "cascade": cascade["rating"], "escalated": escalated,
+        "lat_primary": t1 - t0, "lat_cascade": t2 - t1,
+        "cost_primary": cost_primary, "cost_cascade": cost_cascade,
+    }
+
+def _near(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if a in LEVELS and b in LEVELS:
+        return abs(LEVELS.index(a) - LEVELS.index(b)) <= 1
+    return False
+
+async def _main(args) -> None:
+    prices = dict(DEFAULT_PRICES)
+    for spec in args.price:
+        model, rates = spec.split("=", 1)
+        p_in, p_out = rates.split(",")
+        prices[model] = (float(p_in), float(p_out))
+
+    with open(args.records, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if args.limit:
+        records = records[: args.limit]
+
+    sem = asyncio.Semaphore(args.concurrency)
+    rows = await asyncio.gather(*[_replay(r, sem, prices) for r in records])
+    n = len(rows) or 1
+
+    agree = sum(r["primary"] == r["cascade"] for r in rows) / n
+    near = sum(_near(r["primary"], r["cascade"]) for r in rows) / n
+    esc = sum(r["escalated"] for r in rows) / n
+    cp, cc = sum(r["cost_primary"] for r in rows), sum(r["cost_cascade"] for r in rows)
+    lp, lc = [r["lat_primary"] for r in rows], [r["lat_cascade"] for r in rows]
+
+    print(f"claims:            {len(rows)}")
+    print(f"agreement (exact): {agree:.1%}")
+    print(f"agreement (±1):    {near:.1%}")
+    print(f"escalation rate:   {esc:.1%}")
+    print(f"latency p50/p95 s: primary {_pct(lp, .5):.2f}/{_pct(lp, .95):.2f}  cascade {_pct(lc, .5):.2f}/{_pct(lc, .95):.2f}")
+    print(f"est. cost USD:     primary {cp:.4f}  cascade {cc:.4f}  savings {(1 - cc / cp) if cp else 0:.1%}")
+
+    by_rating: dict[str, list[bool]] = {}
+    for r in rows:
+        by_rating.setdefault(r["primary"], []).append(r["primary"] == r["cascade"])
+    for rating, hits in sorted(by_rating.items()):
+        print(f"  {rating:<10} n={len(hits):<4} agreement {sum(hits) / len(hits):.1%}")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("records", help="JSONL written via VERIFY_RECORD_PATH")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--price", action="append", default=[], metavar="MODEL=IN,OUT",
+                    help="USD per 1M input/output tokens (repeatable)")
+    asyncio.run(_main(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# services/api/bench/factcheck_lookup.py
+"""
+Latency of the local ClaimReview index lookup at scale.
+
+    python -m bench.factcheck_lookup --records 300000
+    python -m bench.factcheck_lookup --index /data/factcheck.idx   # an existing index
+
+Builds an index of synthetic fact checks (Zipf-distributed words, like
+bench.search_latency) unless --index is given, then times --queries
+FactCheckIndex.search() calls with FACTCHECK_INDEX_MIN_MATCH and prints
+p50/p95/p99. Half of the queries paraphrase an indexed claim, so there are
+hits to rank; the rest are fresh claims that should mostly miss.
+"""
+import argparse, os, tempfile, time
+from bench.search_latency import Corpus, _summary
+from claimlens.deps import get_settings
+from claimlens.factcheck_index import FactCheckIndex, build_index
+
+def _records(corpus: Corpus, n: int):
+    for i in range(n):
+        yield {
+            "text": corpus.text(corpus.rnd.randint(8, 20)),
+            "url": f"https://factcheck.example/{i}",
+            "publisher": "Example Checks",
+            "rating": corpus.rnd.choice(["False", "Misleading", "True", "Mostly false"]),
+        }
+
+def _queries(corpus: Corpus, idx: FactCheckIndex, n: int) -> list[str]:
+    out = []
+    for _ in range(n):
+        if corpus.rnd.random() < 0.5:
+            words = idx.doc(corpus.rnd.randrange(idx.n_docs))["text"].split()
+            corpus.rnd.shuffle(words)
+            out.append(" ".join(words[: max(3, len(words) - 2)] + corpus.text(2).split()))
+        else:
+            out.append(corpus.text(corpus.rnd.randint(8, 20)))
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--records", type=int, default=300_000)
+    ap.add_argument("--index", help="existing index file (skips the synthetic build)")
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument("--k", type=int, default=2)
+    ap.add_argument("--min-match", type=float, default=get_settings().FACTCHECK_INDEX_MIN_MATCH)
+    ap.add_argument("--random-seed", type=int, default=1)
+    args = ap.parse_args()
+
+    corpus = Corpus(args.random_seed)
+    path = args.index
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(prefix="claimlens-fc-"), "factcheck.idx")
+        t0 = time.perf_counter()
+        n = build_index(_records(corpus, args.records), path)
+        print(f"indexed {n} fact checks in {time.perf_counter() - t0:.1f}s ({os.path.getsize(path) / 2**20:.0f} MiB)")
+    idx = FactCheckIndex(path)
+
+    samples, hits = [], 0
+    for q in _queries(corpus, idx, args.queries):
+        t = time.perf_counter()
+        hits += bool(idx.search(q, k=args.k, min_match=args.min_match))
+        samples.append(time.perf_counter() - t)
+    print(f"queries with a hit: {hits}/{args.queries}")
+    _summary("factcheck", samples)
+
+if __name__ == "__main__":
+    main()
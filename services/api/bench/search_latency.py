@@ -0,0 +1,133 @@
+# services/api/bench/search_latency.py
+"""
+Latency of GET /search's ranking query at scale, per backend.
+
+    python -m bench.search_latency --backend memory --reports 100000
+    DATABASE_URL=postgresql://... python -m bench.search_latency --backend postgres --seed
+
+Generates synthetic reports (--claims per report, Zipf-distributed words),
+indexes them in process or — with --seed — copies them into the `reports`
+table of a SCRATCH Postgres database that has infra/supabase_schema.sql
+applied, then times --queries calls to search_reports() and prints
+p50/p95/p99. Postgres timings include the round trip from this machine.
+"""
+import argparse, asyncio, itertools, json, os, random, statistics, time, uuid
+from claimlens.report_search import InvertedIndex
+
+RATINGS = ["solid", "reliable", "mixed", "doubtful"]
+_SYLLABLES = ["ka", "lo", "mi", "ren", "tu", "sa", "vel", "or", "di", "pa", "ne", "qua", "shi", "tor", "bel", "an"]
+
+def _vocab(rnd: random.Random, size: int) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4))))
+    return sorted(words)
+
+class Corpus:
+    def __init__(self, seed: int, vocab_size: int = 20000) -> None:
+        self.rnd = random.Random(seed)
+        self.words = _vocab(self.rnd, vocab_size)
+        self.cum = list(itertools.accumulate(1 / (i + 1) for i in range(vocab_size)))
+
+    def text(self, n: int) -> str:
+        return " ".join(self.rnd.choices(self.words, cum_weights=self.cum, k=n))
+
+    def report(self, claims: int) -> dict:
+        return {
+            "video": {"id": uuid.uuid4().hex[:11], "title": self.text(8), "channel": self.text(2)},
+            "videoSummary": self.text(30),
+            "consensus": {"rating": self.rnd.choice(RATINGS), "summary": self.text(20)},
+            "claims": [{"text": self.text(15), "rating": self.rnd.choice(RATINGS)} for _ in range(claims)],
+        }
+
+    def queries(self, n: int) -> list[tuple[str, str | None]]:
+        """Mix of 1-3 word queries and short title-ish queries; a quarter filter by rating."""
+        out = []
+        for _ in range(n):
+            q = self.text(self.rnd.randint(1, 3)) if self.rnd.random() < 0.7 else self.rnd.choice(self.words[:2000])[:5]
+            out.append((q, self.rnd.choice(RATINGS) if self.rnd.random() < 0.25 else None))
+        return out
+
+def _summary(name: str, samples: list[float]) -> None:
+    ms = sorted(x * 1000 for x in samples)
+    pct = lambda p: ms[min(len(ms) - 1, int(p * len(ms)))]
+    print(f"{name}: n={len(ms)}  p50={pct(0.50):.2f} ms  p95={pct(0.95):.2f} ms  "
+          f"p99={pct(0.99):.2f} ms  mean={statistics.fmean(ms):.2f} ms")
+
+def run_memory(args, corpus: Corpus) -> None:
+    index = InvertedIndex()
+    t0 = time.perf_counter()
+    for _ in range(args.reports):
+        index.add(str(uuid.uuid4()), corpus.report(args.claims))
+    print(f"indexed {args.reports} reports / {args.reports * args.claims} claims in {time.perf_counter() - t0:.1f}s")
+    samples = []
+    for q, rating in corpus.queries(args.queries):
+        t = time.perf_counter()
+        index.search(q, rating=rating, limit=args.limit + 1)
+        samples.append(time.perf_counter() - t)
+    _summary("memory", samples)
+
+async def run_postgres(args, corpus: Corpus) -> None:
+    import asyncpg  # type: ignore
+
+    dsn = args.dsn or os.getenv("DATABASE_URL")
+    if not dsn:
+        raise SystemExit("--dsn or DATABASE_URL is required for --backend postgres")
+    conn = await asyncpg.connect(dsn)
+    # Binary jsonb (version byte + text) so COPY can stream rows
+    await conn.set_type_codec(
+        "jsonb", schema="pg_catalog", format="binary",
+        encoder=lambda v: b"\x01" + json.dumps(v).encode(), decoder=lambda b: json.loads(b[1:]),
+    )
+    try:
+        if args.seed:
+            t0 = time.perf_counter()
+            for start in range(0, args.reports, 5000):
+                rows = []
+                for _ in range(min(5000, args.reports - start)):
+                    data = corpus.report(args.claims)
+                    rows.append((uuid.uuid4(), data["video"]["id"], data))
+                await conn.copy_records_to_table("reports", records=rows, columns=["id", "video_id", "data"])
+            await conn.execute("analyze reports")
+            print(f"seeded {args.reports} reports in {time.perf_counter() - t0:.1f}s")
+        total = await conn.fetchval("select count(*) from reports")
+        print(f"reports table: {total} rows")
+
+        queries = corpus.queries(args.queries)
+        sql = "select * from search_reports($1, $2, null, null, $3)"
+        if args.explain:
+            q, rating = queries[0]
+            plan = await conn.fetch("explain (analyze, buffers) " + sql, q, rating, args.limit + 1)
+            print("\n".join(r[0] for r in plan))
+        for q, rating in queries[:10]:  # warm the cache
+            await conn.fetch(sql, q, rating, args.limit + 1)
+        samples = []
+        for q, rating in queries:
+            t = time.perf_counter()
+            await conn.fetch(sql, q, rating, args.limit + 1)
+            samples.append(time.perf_counter() - t)
+        _summary("postgres", samples)
+    finally:
+        await conn.close()
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--backend", choices=["memory", "postgres"], default="memory")
+    ap.add_argument("--reports", type=int, default=100_000)
+    ap.add_argument("--claims", type=int, default=10, help="claims per report")
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument("--limit", type=int, default=10)
+    ap.add_argument("--dsn", help="Postgres DSN (default: $DATABASE_URL)")
+    ap.add_argument("--seed", action="store_true", help="insert --reports synthetic rows first (scratch DB only!)")
+    ap.add_argument("--explain", action="store_true", help="print EXPLAIN ANALYZE for one query")
+    ap.add_argument("--random-seed", type=int, default=1)
+    args = ap.parse_args()
+
+    corpus = Corpus(args.random_seed)
+    if args.backend == "memory":
+        run_memory(args, corpus)
+    else:
+        asyncio.run(run_postgres(args, corpus))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# services/api/bench/stt_rtf.py
+"""
+Real-time factor of the local speech-to-text fallback per core count.
+
+    python -m bench.stt_rtf path/to/audio.m4a --cores 1 2 4
+
+RTF = wall-clock transcription time / audio duration (lower is better).
+Model load happens in the pool initializer and is excluded via a warm-up.
+"""
+import argparse, asyncio, time
+from claimlens.stt import SAMPLE_RATE, load_pcm, make_pool, transcribe_pcm
+
+async def _run(pcm, cores: int, language: str | None) -> tuple[float, int]:
+    with make_pool(cores) as pool:
+        # Warm every worker (loads the model) before timing
+        await transcribe_pcm(pcm[: SAMPLE_RATE * cores * 2], language=language, pool=pool)
+        t0 = time.perf_counter()
+        segments = await transcribe_pcm(pcm, language=language, pool=pool)
+        return time.perf_counter() - t0, len(segments)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("audio")
+    ap.add_argument("--cores", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--language", default="en")
+    args = ap.parse_args()
+
+    pcm = load_pcm(args.audio)
+    audio_s = len(pcm) / SAMPLE_RATE
+    print(f"audio: {audio_s:.1f}s")
+    print(f"{'cores':>5}  {'wall_s':>8}  {'rtf':>6}  {'speedup':>7}  segments")
+    base = None
+    for cores in args.cores:
+        wall, n = asyncio.run(_run(pcm, cores, args.language or None))
+        base = base or wall
+        print(f"{cores:>5}  {wall:>8.2f}  {wall / audio_s:>6.3f}  {base / wall:>6.2f}x  {n}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# services/api/claimlens/admission.py
+"""
+Admission control and load shedding.
+
+Every request except /health and /metrics goes through a lane: "analyze"
+(/analyze, /analyze/batch) or "read" (everything else). Each lane has its own
+in-flight limit and a short FIFO wait queue, so a burst of analyses cannot
+starve saved-report reads. A request that can't start within
+ADMISSION_QUEUE_TIMEOUT_S, or that finds the queue full, gets an immediate 503
+with Retry-After instead of joining a pile-up where everyone times out.
+
+Fair share: one client (by X-Forwarded-For / peer address) may hold at most
+ADMISSION_CLIENT_SHARE of a lane's slots and the same number of queue
+entries. Freed slots are handed out round-robin across waiting clients.
+"""
+import asyncio, logging, math, time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+from fastapi.responses import JSONResponse
+from .deps import get_settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+EXEMPT_PATHS = ("/health", "/metrics")
+
+class Shed(Exception):
+    """The lane refused the request; `reason` is queue_full, client_quota or queue_timeout."""
+    def __init__(self, reason: str, retry_after_s: int) -> None:
+        super().__init__(reason)
+        self.reason, self.retry_after_s = reason, retry_after_s
+
+class Lane:
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout_s: float, client_share: float) -> None:
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.queue_timeout_s = queue_timeout_s
+        self.client_limit = max(1, math.floor(self.limit * client_share))
+        self.in_flight = 0
+        self._by_client: Dict[str, int] = {}
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._queued = 0
+        self._service_s = 1.0  # EWMA of how long a slot is held; drives Retry-After
+
+    # --- bookkeeping ------------------------------------------------------
+
+    def _gauges(self) -> None:
+        metrics.set_gauge("admission_in_flight", self.in_flight, doc="Requests holding a slot", lane=self.name)
+        metrics.set_gauge("admission_queued", self._queued, doc="Requests waiting for a slot", lane=self.name)
+
+    def _grant(self, client: str) -> None:
+        self.in_flight += 1
+        self._by_client[client] = self._by_client.get(client, 0) + 1
+
+    def _shed(self, reason: str) -> Shed:
+        metrics.inc("admission_shed_total", doc="Requests rejected with 503", lane=self.name, reason=reason)
+        backlog = (self._queued + 1) / self.limit
+        return Shed(reason, max(1, min(60, math.ceil(self._service_s * backlog))))
+
+    def _can_run(self, client: str) -> bool:
+        return self.in_flight < self.limit and self._by_client.get(client, 0) < self.client_limit
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting clients, one per client per round."""
+        while self.in_flight < self.limit and self._waiters:
+            granted = False
+            for client in list(self._waiters):
+                if not self._can_run(client):
+                    continue
+                queue = self._waiters.pop(client)
+                fut = queue.popleft()
+                self._queued -= 1
+                if queue:
+                    self._waiters[client] = queue  # back of the round-robin order
+                self._grant(client)
+                fut.set_result(None)
+                granted = True
+                break
+            if not granted:
+                break
+
+    def _remove_waiter(self, client: str, fut: asyncio.Future) -> None:
+        queue = self._waiters.get(client)
+        if queue is not None and fut in queue:
+            queue.remove(fut)
+            self._queued -= 1
+            if not queue:
+                del self._waiters[client]
+
+    # --- public API -------------------------------------------------------
+
+    async def acquire(self, client: str) -> None:
+        """Take a slot, waiting up to queue_timeout_s; raises Shed if that isn't possible."""
+        # Other clients' waiters are blocked by their own quota (else _dispatch ran them)
+        if client not in self._waiters and self._can_run(client):
+            self._grant(client)
+            metrics.inc("admission_admitted_total", doc="Requests admitted", lane=self.name, queued="false")
+            self._gauges()
+            return
+        if self._queued >= self.queue_size:
+            raise self._shed("queue_full")
+        if len(self._waiters.get(client, ())) >= self.client_limit:
+            raise self._shed("client_quota")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client, deque()).append(fut)
+        self._queued += 1
+        self._gauges()
+        t0 = time.monotonic()
+        try:
+            await asyncio.wait({fut}, timeout=self.queue_timeout_s)
+        except asyncio.CancelledError:
+            # Client went away while queued; give back a slot we may just have been handed
+            if fut.done() and not fut.cancelled():
+                self.release(client, 0.0)
+            else:
+                fut.cancel()
+                self._remove_waiter(client, fut)
+                self._gauges()
+            raise
+        waited = time.monotonic() - t0
+        metrics.inc("admission_queue_wait_seconds_total", waited, doc="Time spent queued", lane=self.name)
+        metrics.inc("admission_queue_waits_total", doc="Requests that had to queue", lane=self.name)
+        if not fut.done():
+            fut.cancel()
+            self._remove_waiter(client, fut)
+            self._gauges()
+            raise self._shed("queue_timeout")
+        metrics.inc("admission_admitted_total", doc="Requests admitted", lane=self.name, queued="true")
+        self._gauges()
+
+    def release(self, client: str, held_s: float) -> None:
+        self.in_flight -= 1
+        left = self._by_client.get(client, 1) - 1
+        if left:
+            self._by_client[client] = left
+        else:
+            self._by_client.pop(client, None)
+        if held_s:
+            self._service_s = 0.8 * self._service_s + 0.2 * held_s
+        self._dispatch()
+        self._gauges()
+
+_lanes: Dict[str, Lane] = {}
+
+def get_lane(name: str) -> Lane:
+    if name not in _lanes:
+        s = get_settings()
+        limit, queue_size = {
+            "analyze": (s.ADMISSION_ANALYZE_CONCURRENCY, s.ADMISSION_ANALYZE_QUEUE),
+            "read": (s.ADMISSION_READ_CONCURRENCY, s.ADMISSION_READ_QUEUE),
+        }[name]
+        _lanes[name] = Lane(name, limit, queue_size, s.ADMISSION_QUEUE_TIMEOUT_S, s.ADMISSION_CLIENT_SHARE)
+    return _lanes[name]
+
+def lane_for(path: str) -> Optional[str]:
+    if path in EXEMPT_PATHS:
+        return None
+    return "analyze" if path.startswith("/analyze") else "read"
+
+def client_key(scope: dict) -> str:
+    """Caller identity for fair share: the address Cloud Run's front end appended, else the peer."""
+    for name, value in scope.get("headers") or []:
+        if name == b"x-forwarded-for":
+            return value.decode("latin-1").split(",")[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class AdmissionMiddleware:
+    """ASGI middleware, so a slot is held until the whole (possibly streamed) body is sent."""
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "OPTIONS":
+            return await self.app(scope, receive, send)
+        name = lane_for(scope["path"])
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        lane, client = get_lane(name), client_key(scope)
+        try:
+            await lane.acquire(client)
+        except Shed as e:
+            logger.warning(f"Shed {scope['path']} from {client}: {e.reason}")
+            response = JSONResponse(
+                {"detail": "Server busy, retry later"}, status_code=503,
+                headers={"Retry-After": str(e.retry_after_s)},
+            )
+            return await response(scope, receive, send)
+
+        t0 = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release(client, time.monotonic() - t0)
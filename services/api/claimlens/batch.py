@@ -0,0 +1,144 @@
+# services/api/claimlens/batch.py
+import asyncio, re, time
+import logging
+from typing import AsyncIterator
+from .models import AnalyzeBatchRequest, AnalyzeResponse, Video, Claim, Consensus
+from .deps import get_settings
+from .prompts import PROMPT_VERSION
+from datetime import datetime, timezone
+from .youtube import extract_video_id, video_meta
+from .pipeline import transcript_with_fallback, extract_claims, verify_one, consensus_from, claim_record
+from .openai_client import track_usage, answered_model
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_NEGATION = re.compile(r"\b(?:not|no|never|nor|none|nothing|neither|nobody)\b|n['\u2019]t\b")
+
+def normalize_claim(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_WORD.findall((text or "").lower()))
+
+def claim_signature(text: str) -> tuple[frozenset[str], frozenset[str]]:
+    """The numbers and negation words in a claim; near-duplicates must agree on both."""
+    low = (text or "").lower()
+    numbers = frozenset(n.replace(",", "") for n in _NUMBER.findall(low))
+    negations = frozenset("not" if w[1] in "'\u2019" else w for w in _NEGATION.findall(low))
+    return numbers, negations
+
+class ClaimIndex:
+    """
+    Groups identical or near-identical claims across videos.
+    Exact matches hit a dict on the normalized text; near matches are found
+    by token-set Jaccard similarity against the representatives seen so far,
+    but only among claims with the same numbers and negations, so "X raised
+    taxes by 5%" never merges with "X raised taxes by 50%" or "X did not
+    raise taxes".
+    """
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+        self._exact: dict[str, str] = {}
+        self._reps: dict[tuple[frozenset[str], frozenset[str]], list[tuple[str, frozenset[str]]]] = {}
+
+    def canonical(self, text: str) -> str:
+        """Return the key of the group `text` belongs to, creating one if needed."""
+        norm = normalize_claim(text)
+        key = self._exact.get(norm)
+        if key is not None:
+            return key
+        tokens = frozenset(norm.split())
+        reps = self._reps.setdefault(claim_signature(text), [])
+        for rep, rep_tokens in reps:
+            union = len(tokens | rep_tokens)
+            if union and len(tokens & rep_tokens) / union >= self.threshold:
+                self._exact[norm] = rep
+                return rep
+        reps.append((norm, tokens))
+        self._exact[norm] = norm
+        return norm
+
+async def run_batch(req: AnalyzeBatchRequest) -> AsyncIterator[tuple[str, AnalyzeResponse | Exception]]:
+    """
+    Analyze many videos under one concurrency budget, verifying each unique
+    claim once. Yields (url, report-or-exception) as each video finishes.
+    """
+    s = get_settings()
+    sem = asyncio.Semaphore(s.BATCH_CONCURRENCY)
+    index = ClaimIndex(s.CLAIM_DEDUP_THRESHOLD)
+    verifications: dict[str, asyncio.Task] = {}
+    max_claims = min(req.maxClaims, s.MAX_CLAIMS)
+
+    async def _verify_unique(text: str) -> dict:
+        async with sem:
+            return await verify_one(text)
+
+    def _verification(text: str) -> tuple[asyncio.Task, bool]:
+        key = index.canonical(text)
+        task = verifications.get(key)
+        if task is not None:
+            return task, True
+        task = asyncio.create_task(_verify_unique(text))
+        verifications[key] = task
+        return task, False
+
+    async def _analyze(vid: str) -> AnalyzeResponse:
+        t0 = time.time()
+        # Shared verifications count toward the video that started them
+        usage = track_usage()
+        async with sem:
+            meta, tr = await asyncio.gather(video_meta(vid), transcript_with_fallback(vid, req.locale))
+
+        async with sem:
+            claims_text, video_summary = await extract_claims(tr, max_claims)
+
+        pending = [_verification(c) for c in claims_text]
+        # shield: one video failing must not cancel verifications other videos share
+        results = await asyncio.gather(*[asyncio.shield(t) for t, _ in pending])
+        verified = [claim_record(c, v) for c, v in zip(claims_text, results)]
+
+        async with sem:
+            cons = await consensus_from(verified)
+
+        return AnalyzeResponse(
+            video=Video(**meta),
+            consensus=Consensus(**cons),
+            claims=[Claim(**v) for v in verified],
+            meta={
+                "tookMs": int((time.time() - t0) * 1000),
+                "model": answered_model(usage),
+                "promptVersion": PROMPT_VERSION,
+                "analyzedAt": datetime.now(timezone.utc).isoformat(),
+                "cached": False,
+                "sharedClaims": sum(1 for _, shared in pending if shared),
+            },
+            videoSummary=video_summary or "",
+        )
+
+    # The same video listed twice is analyzed once
+    by_video: dict[str, asyncio.Task] = {}
+
+    async def _one(url: str) -> tuple[str, AnalyzeResponse | Exception]:
+        vid = extract_video_id(url)
+        if not vid:
+            return url, ValueError("Invalid YouTube URL")
+        task = by_video.get(vid)
+        if task is None:
+            task = by_video[vid] = asyncio.create_task(_analyze(vid))
+        try:
+            return url, await asyncio.shield(task)
+        except Exception as e:
+            return url, e
+
+    jobs = [asyncio.create_task(_one(str(u))) for u in req.urls]
+    try:
+        for fut in asyncio.as_completed(jobs):
+            yield await fut
+    finally:
+        # Client went away or iteration stopped early: don't leak background work
+        for t in [*jobs, *by_video.values(), *verifications.values()]:
+            t.cancel()
+    logger.info(
+        "Batch done: %d urls, %d videos, %d unique claims verified",
+        len(req.urls), len(by_video), len(verifications),
+    )
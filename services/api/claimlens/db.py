@@ -1,11 +1,28 @@
 """Database module for handling Supabase operations."""
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime
 import uuid
 from supabase import create_client, Client
 from .deps import get_settings
 
 settings = get_settings()
 
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Supabase/ISO timestamp, tolerating 'Z' and non-6-digit microseconds."""
+    if not value:
+        return None
+    # Handle both Z and +00:00 timezone formats, and normalize microseconds
+    normalized_str = value.replace('Z', '+00:00')
+    # Ensure microseconds are exactly 6 digits (Python requirement)
+    if '.' in normalized_str and '+' in normalized_str:
+        dt_part, tz_part = normalized_str.rsplit('+', 1)
+        if '.' in dt_part:
+            base_part, microsec_part = dt_part.split('.')
+            # Pad or truncate to exactly 6 digits
+            microsec_part = microsec_part.ljust(6, '0')[:6]
+            normalized_str = f"{base_part}.{microsec_part}+{tz_part}"
+    return datetime.fromisoformat(normalized_str)
+
 class Database:
     _instance = None
     _client: Optional[Client] = None
@@ -84,6 +101,22 @@ class Database:
         except Exception as e:
             raise Exception(f"Failed to save report: {str(e)}")
 
+    def upsert_reports(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Insert or replace full report rows (id, data, video_id, created_at).
+        Blocking; the write-behind flusher calls it from a worker thread.
+        Idempotent on id, so a retried batch never duplicates reports.
+        """
+        if not self._client:
+            self._initialize_client()
+        
+        try:
+            response = self._client.table(settings.SUPABASE_TABLE).upsert(rows).execute()
+            if not response.data:
+                raise Exception("No data returned from database")
+        except Exception as e:
+            raise Exception(f"Failed to upsert reports: {str(e)}")
+
     async def get_latest_report_by_video_id(self, video_id: str) -> Optional[Dict[str, Any]]:
         """Return the latest report row (id, data, video_id, created_at) for a given video_id, or None."""
         if not self._client:
@@ -180,6 +213,44 @@ class Database:
         except Exception as e:
             raise Exception(f"Failed to fetch report by ID: {str(e)}")
     
+    async def search_reports(
+        self, q: str, rating: Optional[str] = None, limit: int = 10,
+        after: Optional[Tuple[float, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Ranked full-text search via the `search_reports` SQL function."""
+        if not self._client:
+            self._initialize_client()
+        
+        params = {
+            "q": q,
+            "rating": rating,
+            "after_rank": after[0] if after else None,
+            "after_id": after[1] if after else None,
+            "lim": limit,
+        }
+        try:
+            response = self._client.rpc("search_reports", params).execute()
+            return response.data or []
+        except Exception as e:
+            raise Exception(f"Failed to search reports: {str(e)}")
+    
+    async def update_report(self, report_id: str, report_data: Dict[str, Any]) -> bool:
+        """Replace the data of an existing report in place. Returns False if not found."""
+        if not self._client:
+            self._initialize_client()
+        
+        try:
+            response = (
+                self._client
+                .table(settings.SUPABASE_TABLE)
+                .update({"data": report_data})
+                .eq("id", report_id)
+                .execute()
+            )
+            return bool(response.data)
+        except Exception as e:
+            raise Exception(f"Failed to update report: {str(e)}")
+    
     async def delete_report(self, report_id: str) -> bool:
         """Delete a report by ID. Returns True if deleted, False if not found."""
         if not self._client:
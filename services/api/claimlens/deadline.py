@@ -0,0 +1,56 @@
+# services/api/claimlens/deadline.py
+"""
+Per-request latency budget.
+
+The deadline lives in a ContextVar, so it follows the request into every
+task it spawns; upstream calls size their timeouts with timeout_for().
+Work that should outlive the request (e.g. finishing late claims) is started
+in a without_deadline() context.
+"""
+import asyncio, contextvars, time
+from contextlib import contextmanager
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("claimlens_deadline", default=None)
+
+class DeadlineExceeded(asyncio.TimeoutError): ...
+
+@contextmanager
+def request_deadline(budget_s: float):
+    token = _deadline.set(time.monotonic() + budget_s)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None when there is no deadline."""
+    d = _deadline.get()
+    return None if d is None else d - time.monotonic()
+
+def timeout_for(default: float) -> float:
+    """Timeout for one upstream call: `default`, capped by what's left of the budget."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(default, left)
+
+async def within_deadline(aw: Awaitable[T]) -> T:
+    """Await `aw`, raising DeadlineExceeded if the budget runs out first."""
+    left = remaining()
+    if left is None:
+        return await aw
+    try:
+        return await asyncio.wait_for(aw, max(0.0, left))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+def without_deadline() -> contextvars.Context:
+    """A copy of the current context with no deadline, for background work."""
+    ctx = contextvars.copy_context()
+    ctx.run(_deadline.set, None)
+    return ctx
@@ -15,6 +15,12 @@ def _int(name: str, default: int) -> int:
     except Exception:
         return default
 
+def _float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "").strip() or default)
+    except Exception:
+        return default
+
 def _list(name: str, default: List[str]) -> List[str]:
     raw = os.getenv(name)
     if not raw:
@@ -35,9 +41,108 @@ class Settings:
     MODEL_FALLBACK: str
     BING_API_KEY: str | None
 
+    # prompt token budgets
+    EXTRACT_TRANSCRIPT_TOKENS: int
+    VERIFY_SNIPPET_TOKENS: int
+    VERIFY_SNIPPET_MAX_TOKENS: int
+    VERIFY_MAX_TOKENS: int
+    CONSENSUS_RATIONALE_TOKENS: int
+    CONSENSUS_MAX_TOKENS: int
+
+    # verification cascade
+    CASCADE_ENABLED: bool
+    MODEL_CASCADE: str
+    CASCADE_MIN_CONFIDENCE: float
+    CASCADE_ESCALATE_RATINGS: List[str]
+    VERIFY_RECORD_PATH: str
+
+    # OpenAI resilience
+    OPENAI_MAX_RETRIES: int
+    OPENAI_BACKOFF_BASE_S: float
+    OPENAI_BACKOFF_MAX_S: float
+    HEDGE_ENABLED: bool
+    HEDGE_DEFAULT_DELAY_S: float
+    HEDGE_MIN_DELAY_S: float
+    BREAKER_FAILURES: int
+    BREAKER_RESET_S: int
+
     # limits
     MAX_CLAIMS: int
     HTTP_TIMEOUT_S: int
+    HTTP_MAX_CONNECTIONS: int
+
+    # request deadlines
+    REQUEST_DEADLINE_S: int
+    REQUEST_DEADLINE_MAX_S: int
+    DEADLINE_CONSENSUS_RESERVE_S: int
+
+    # YouTube transcripts
+    YT_CONCURRENCY: int
+    YT_TRACKS_TTL_S: int
+    YT_INNERTUBE_KEY: str
+
+    # batch analysis
+    BATCH_CONCURRENCY: int
+    CLAIM_DEDUP_THRESHOLD: float
+
+    # local speech-to-text fallback
+    STT_ENABLED: bool
+    STT_MODEL: str
+    STT_COMPUTE_TYPE: str
+    STT_WORKERS: int
+    STT_LOCAL_AUDIO_DIR: str
+    STT_MAX_AUDIO_S: int
+    STT_PIPELINE_RESERVE_S: int
+    STT_RETRY_AFTER_S: int
+
+    # saved-report search: "postgres" (SQL function) or "memory" (in-process index)
+    SEARCH_BACKEND: str
+
+    # local ClaimReview index (claimlens/factcheck_index.py)
+    FACTCHECK_INDEX_PATH: str
+    FACTCHECK_INDEX_MIN_MATCH: float
+    FACTCHECK_API_FALLBACK: bool
+    FACTCHECK_FEED_URL: str
+    FACTCHECK_REFRESH_INTERVAL_S: int
+
+    # write-behind persistence
+    PERSIST_WRITE_BEHIND: bool
+    PERSIST_BATCH_SIZE: int
+    PERSIST_FLUSH_INTERVAL_S: float
+    PERSIST_FLUSH_DELAY_S: float
+    PERSIST_MAX_RETRIES: int
+    PERSIST_SPILL_PATH: str
+    PERSIST_SPILL_REDIS_KEY: str
+    REDIS_URL: str
+
+    # report freshness
+    REPORT_MAX_AGE_S: int
+    PARTIAL_REPORT_GRACE_S: int
+    REFRESH_CONCURRENCY: int
+    REANALYZE_PER_MIN: int
+    ADMIN_TOKEN: str
+
+    # on-demand profiling (CLAIMLENS_DEBUG + ADMIN_TOKEN)
+    PROFILE_DIR: str
+    PROFILE_INTERVAL_S: float
+    PROFILE_BLOCK_THRESHOLD_MS: int
+    PROFILE_TOP_ALLOCS: int
+    PROFILE_TRACEMALLOC_FRAMES: int
+
+    # admission control (claimlens/admission.py)
+    ADMISSION_ENABLED: bool
+    ADMISSION_ANALYZE_CONCURRENCY: int
+    ADMISSION_ANALYZE_QUEUE: int
+    ADMISSION_READ_CONCURRENCY: int
+    ADMISSION_READ_QUEUE: int
+    ADMISSION_QUEUE_TIMEOUT_S: float
+    ADMISSION_CLIENT_SHARE: float
+
+    # HTTP caching / compression
+    REPORT_CACHE_MAX_AGE_S: int
+    REPORT_CACHE_S_MAXAGE_S: int
+    REPORTS_LIST_CACHE_MAX_AGE_S: int
+    GZIP_MIN_BYTES: int
 
     # CORS
     CORS_ALLOW_ORIGINS: List[str]
@@ -56,9 +161,121 @@ class Settings:
         self.BING_API_KEY    = os.getenv("BING_API_KEY")
         self.MODEL_PRIMARY   = os.getenv("MODEL_PRIMARY", "gpt-4o")
         self.MODEL_FALLBACK  = os.getenv("MODEL_FALLBACK", "gpt-3.5-turbo")
+
+        # Token budgets (tiktoken) for prompts and completions per stage
+        self.EXTRACT_TRANSCRIPT_TOKENS  = _int("EXTRACT_TRANSCRIPT_TOKENS", 3000)
+        self.VERIFY_SNIPPET_TOKENS      = _int("VERIFY_SNIPPET_TOKENS", 600)
+        self.VERIFY_SNIPPET_MAX_TOKENS  = _int("VERIFY_SNIPPET_MAX_TOKENS", 120)
+        self.VERIFY_MAX_TOKENS          = _int("VERIFY_MAX_TOKENS", 300)
+        self.CONSENSUS_RATIONALE_TOKENS = _int("CONSENSUS_RATIONALE_TOKENS", 60)
+        self.CONSENSUS_MAX_TOKENS       = _int("CONSENSUS_MAX_TOKENS", 250)
+
+        # Cheap model first; escalate low-confidence or disputed ratings to MODEL_PRIMARY
+        self.CASCADE_ENABLED          = _bool("CASCADE_ENABLED", False)
+        self.MODEL_CASCADE            = os.getenv("MODEL_CASCADE", "gpt-4o-mini")
+        self.CASCADE_MIN_CONFIDENCE   = _float("CASCADE_MIN_CONFIDENCE", 0.8)
+        self.CASCADE_ESCALATE_RATINGS = _list("CASCADE_ESCALATE_RATINGS", ["mixed", "doubtful"])
+        # JSONL of {claim, snippets} for bench/cascade_eval.py replays
+        self.VERIFY_RECORD_PATH       = os.getenv("VERIFY_RECORD_PATH", "")
+
+        # Retries with jittered backoff, p95-based hedging, per-model circuit breakers
+        self.OPENAI_MAX_RETRIES    = _int("OPENAI_MAX_RETRIES", 1)
+        self.OPENAI_BACKOFF_BASE_S = _float("OPENAI_BACKOFF_BASE_S", 0.5)
+        self.OPENAI_BACKOFF_MAX_S  = _float("OPENAI_BACKOFF_MAX_S", 8.0)
+        self.HEDGE_ENABLED         = _bool("HEDGE_ENABLED", True)
+        self.HEDGE_DEFAULT_DELAY_S = _float("HEDGE_DEFAULT_DELAY_S", 6.0)
+        self.HEDGE_MIN_DELAY_S     = _float("HEDGE_MIN_DELAY_S", 1.0)
+        self.BREAKER_FAILURES      = _int("BREAKER_FAILURES", 5)
+        self.BREAKER_RESET_S       = _int("BREAKER_RESET_S", 30)
         
         self.MAX_CLAIMS      = _int("MAX_CLAIMS", 8)
         self.HTTP_TIMEOUT_S  = _int("HTTP_TIMEOUT_S", 30)
+        self.HTTP_MAX_CONNECTIONS = _int("HTTP_MAX_CONNECTIONS", 100)
+
+        # Per-instance in-flight limits and short wait queues; overflow gets 503 + Retry-After
+        self.ADMISSION_ENABLED             = _bool("ADMISSION_ENABLED", True)
+        self.ADMISSION_ANALYZE_CONCURRENCY = _int("ADMISSION_ANALYZE_CONCURRENCY", 4)
+        self.ADMISSION_ANALYZE_QUEUE       = _int("ADMISSION_ANALYZE_QUEUE", 8)
+        self.ADMISSION_READ_CONCURRENCY    = _int("ADMISSION_READ_CONCURRENCY", 32)
+        self.ADMISSION_READ_QUEUE          = _int("ADMISSION_READ_QUEUE", 64)
+        self.ADMISSION_QUEUE_TIMEOUT_S     = _float("ADMISSION_QUEUE_TIMEOUT_S", 2.0)
+        # Largest share of a lane's slots (and queue entries) one client may hold
+        self.ADMISSION_CLIENT_SHARE        = _float("ADMISSION_CLIENT_SHARE", 0.5)
+
+        # /analyze latency budget (client may ask for a different one, up to the cap)
+        self.REQUEST_DEADLINE_S           = _int("REQUEST_DEADLINE_S", 45)
+        self.REQUEST_DEADLINE_MAX_S       = _int("REQUEST_DEADLINE_MAX_S", 120)
+        self.DEADLINE_CONSENSUS_RESERVE_S = _int("DEADLINE_CONSENSUS_RESERVE_S", 4)
+
+        # Bound concurrent YouTube traffic; caption track lists are cached per video
+        self.YT_CONCURRENCY   = _int("YT_CONCURRENCY", 8)
+        self.YT_TRACKS_TTL_S  = _int("YT_TRACKS_TTL_S", 6 * 3600)
+        self.YT_INNERTUBE_KEY = os.getenv("YT_INNERTUBE_KEY", "")
+
+        # One upstream budget shared by every video in a /analyze/batch call
+        self.BATCH_CONCURRENCY     = _int("BATCH_CONCURRENCY", 6)
+        # Token Jaccard similarity at which two claims count as the same claim
+        self.CLAIM_DEDUP_THRESHOLD = _float("CLAIM_DEDUP_THRESHOLD", 0.85)
+
+        # Whisper fallback for videos without captions (needs the `stt` extra + ffmpeg)
+        self.STT_ENABLED         = _bool("STT_ENABLED", False)
+        self.STT_MODEL           = os.getenv("STT_MODEL", "base")
+        self.STT_COMPUTE_TYPE    = os.getenv("STT_COMPUTE_TYPE", "int8")
+        # Each worker loads its own model (~150 MB for "base"); one fits a 512Mi instance
+        self.STT_WORKERS         = _int("STT_WORKERS", 1)
+        self.STT_LOCAL_AUDIO_DIR = os.getenv("STT_LOCAL_AUDIO_DIR", "")
+        # Longer videos are refused (decoded PCM is 64 KB/s: 20 min ~ 77 MB); 0 = no limit
+        self.STT_MAX_AUDIO_S     = _int("STT_MAX_AUDIO_S", 1200)
+        # /analyze waits for STT only while this much budget is left for extract + verify;
+        # otherwise it answers 503 + Retry-After and transcription finishes in the background
+        self.STT_PIPELINE_RESERVE_S = _int("STT_PIPELINE_RESERVE_S", 20)
+        self.STT_RETRY_AFTER_S      = _int("STT_RETRY_AFTER_S", 30)
+
+        self.SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "memory" if self.CLAIMLENS_MOCK else "postgres")
+
+        # Fact checks come from a local mmap'd index first; the Google API only on a miss
+        self.FACTCHECK_INDEX_PATH      = os.getenv("FACTCHECK_INDEX_PATH", "")
+        # Share of the claim's IDF mass a local hit must cover to count as a match
+        self.FACTCHECK_INDEX_MIN_MATCH = _float("FACTCHECK_INDEX_MIN_MATCH", 0.6)
+        self.FACTCHECK_API_FALLBACK    = _bool("FACTCHECK_API_FALLBACK", True)
+        # Bulk ClaimReview feed, rebuilt into FACTCHECK_INDEX_PATH by the server every
+        # FACTCHECK_REFRESH_INTERVAL_S (0 = only via `python -m claimlens.factcheck_index refresh`).
+        # JSONL feeds are streamed; a single JSON document is parsed in memory.
+        self.FACTCHECK_FEED_URL        = os.getenv("FACTCHECK_FEED_URL", "")
+        self.FACTCHECK_REFRESH_INTERVAL_S = _int("FACTCHECK_REFRESH_INTERVAL_S", 86400)
+
+        # Reports are saved off the response path, batched, and spilled while the DB is down:
+        # to Redis when REDIS_URL is set, else (best-effort, /tmp is RAM on Cloud Run) to a file
+        self.PERSIST_WRITE_BEHIND     = _bool("PERSIST_WRITE_BEHIND", True)
+        self.PERSIST_BATCH_SIZE       = _int("PERSIST_BATCH_SIZE", 20)
+        self.PERSIST_FLUSH_INTERVAL_S = _float("PERSIST_FLUSH_INTERVAL_S", 5.0)
+        self.PERSIST_FLUSH_DELAY_S    = _float("PERSIST_FLUSH_DELAY_S", 0.2)
+        self.PERSIST_MAX_RETRIES      = _int("PERSIST_MAX_RETRIES", 3)
+        self.PERSIST_SPILL_PATH       = os.getenv("PERSIST_SPILL_PATH", "/tmp/claimlens-pending-reports.jsonl")
+        self.PERSIST_SPILL_REDIS_KEY  = os.getenv("PERSIST_SPILL_REDIS_KEY", "claimlens:pending-reports")
+        self.REDIS_URL                = os.getenv("REDIS_URL", "")
+
+        # Saved reports older than this, or from another model/prompt, are refreshed in the background
+        self.REPORT_MAX_AGE_S    = _int("REPORT_MAX_AGE_S", 30 * 86400)
+        # A report still partial after this long lost its late-claim patch (e.g. the instance died)
+        self.PARTIAL_REPORT_GRACE_S = _int("PARTIAL_REPORT_GRACE_S", 300)
+        self.REFRESH_CONCURRENCY = _int("REFRESH_CONCURRENCY", 2)
+        self.REANALYZE_PER_MIN   = _int("REANALYZE_PER_MIN", 6)
+        self.ADMIN_TOKEN         = os.getenv("ADMIN_TOKEN", "")
+
+        # Per-request profiles requested with X-Claimlens-Profile
+        self.PROFILE_DIR                = os.getenv("PROFILE_DIR", "/tmp/claimlens-profiles")
+        self.PROFILE_INTERVAL_S         = _float("PROFILE_INTERVAL_S", 0.001)
+        self.PROFILE_BLOCK_THRESHOLD_MS = _int("PROFILE_BLOCK_THRESHOLD_MS", 50)
+        self.PROFILE_TOP_ALLOCS         = _int("PROFILE_TOP_ALLOCS", 25)
+        self.PROFILE_TRACEMALLOC_FRAMES = _int("PROFILE_TRACEMALLOC_FRAMES", 1)
+
+        # Browser/app cache vs shared (CDN) cache lifetimes. Reports are refreshed and
+        # patched in place under the same id, so keep both short; ETags make revalidation cheap
+        self.REPORT_CACHE_MAX_AGE_S       = _int("REPORT_CACHE_MAX_AGE_S", 60)
+        self.REPORT_CACHE_S_MAXAGE_S      = _int("REPORT_CACHE_S_MAXAGE_S", 60)
+        self.REPORTS_LIST_CACHE_MAX_AGE_S = _int("REPORTS_LIST_CACHE_MAX_AGE_S", 0)
+        self.GZIP_MIN_BYTES               = _int("GZIP_MIN_BYTES", 1024)
         
         self.CORS_ALLOW_ORIGINS = _list("CORS_ALLOW_ORIGINS", ["*"])
         
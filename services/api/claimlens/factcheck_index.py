@@ -0,0 +1,388 @@
+# services/api/claimlens/factcheck_index.py
+"""
+Local ClaimReview index used by factcheck_claims() before the Google API.
+
+The index is a single read-only file that every worker memory-maps, so the
+OS page cache holds one shared copy:
+
+    header   magic, doc count, slot count, avg doc length, section offsets
+    table    open-addressing hash table: (fnv1a64(term), postings offset, df)
+    postings (doc id u32, term freq u32) pairs, grouped per term
+    docnorm  f32 per doc: BM25 length normalisation k1 * (1 - b + b * len / avg)
+    docoff   u64 byte offsets into docs (n_docs + 1)
+    docs     one UTF-8 JSON object per doc: {text, url, publisher, rating}
+
+Build it from a bulk ClaimReview dump (DataCommons feed, Fact Check Tools API
+responses, or JSONL) and swap it in atomically; readers reopen it when the
+file changes:
+
+    python -m claimlens.factcheck_index build dump.json factcheck.idx
+    python -m claimlens.factcheck_index refresh   # download FACTCHECK_FEED_URL, rebuild
+
+The server does the same refresh in the background every
+FACTCHECK_REFRESH_INTERVAL_S when FACTCHECK_FEED_URL is set (a lock file keeps
+it to one worker per machine), and the Docker image can bake in a first copy
+(build arg FACTCHECK_FEED_URL).
+"""
+import asyncio, bisect, heapq, json, logging, math, mmap, os, shutil, struct, sys, threading, time
+from array import array
+from typing import Iterable, Iterator, List, Optional
+from .deps import get_settings
+from .report_search import tokenize
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"CLFCIDX1"
+_HEADER = struct.Struct("<8sIIdQQQQQ")
+_SLOT = struct.Struct("<QQII")
+_K1, _B = 1.2, 0.75
+_FNV_OFFSET, _FNV_PRIME, _MASK = 0xCBF29CE484222325, 0x100000001B3, (1 << 64) - 1
+
+def _hash(term: str) -> int:
+    h = _FNV_OFFSET
+    for b in term.encode("utf-8"):
+        h = ((h ^ b) * _FNV_PRIME) & _MASK
+    return h or 1  # 0 marks an empty slot
+
+# --- dump parsing -----------------------------------------------------------
+
+def _from_claim_review(cr: dict, fallback_text: str = "") -> Optional[dict]:
+    text = cr.get("claimReviewed") or fallback_text
+    if not text:
+        return None
+    rating = cr.get("reviewRating") or {}
+    author = cr.get("author") or cr.get("publisher") or {}
+    return {
+        "text": text,
+        "url": cr.get("url"),
+        "publisher": author.get("name") if isinstance(author, dict) else str(author),
+        "rating": rating.get("alternateName") if isinstance(rating, dict) else cr.get("textualRating"),
+    }
+
+def iter_records(obj) -> Iterator[dict]:
+    """Normalize ClaimReview data in any supported shape to {text, url, publisher, rating}."""
+    if isinstance(obj, list):
+        for it in obj:
+            yield from iter_records(it)
+    elif isinstance(obj, dict):
+        if "dataFeedElement" in obj:                      # DataCommons ClaimReview feed
+            for el in obj["dataFeedElement"]:
+                yield from iter_records(el.get("item") or [])
+        elif "claims" in obj:                             # Fact Check Tools API response
+            for c in obj["claims"]:
+                for cr in c.get("claimReview") or []:
+                    yield {
+                        "text": c.get("text", ""),
+                        "url": cr.get("url"),
+                        "publisher": (cr.get("publisher") or {}).get("name"),
+                        "rating": cr.get("textualRating"),
+                    }
+        elif obj.get("@type") == "ClaimReview" or "claimReviewed" in obj:
+            rec = _from_claim_review(obj)
+            if rec:
+                yield rec
+        elif obj.get("text"):                             # already flat
+            yield {k: obj.get(k) for k in ("text", "url", "publisher", "rating")}
+
+def load_dump(path: str) -> Iterator[dict]:
+    """Records from a JSON dump (parsed whole) or a JSONL one (streamed line by line)."""
+    with open(path, encoding="utf-8") as f:
+        first = f.readline()
+        jsonl = True
+        try:
+            obj = json.loads(first) if first.strip() else None
+        except json.JSONDecodeError:
+            jsonl = False  # a pretty-printed JSON document
+        if jsonl:
+            if obj is not None:
+                yield from iter_records(obj)
+            for line in f:
+                if line.strip():
+                    yield from iter_records(json.loads(line))
+            return
+        f.seek(0)
+        yield from iter_records(json.load(f))
+
+# --- building ---------------------------------------------------------------
+
+def build_index(records: Iterable[dict], out_path: str) -> int:
+    """
+    Write an index for `records` to out_path (atomically). Returns the doc
+    count. Postings are packed arrays and doc bodies are spooled to disk, so
+    a refresh fits next to the running server.
+    """
+    docs_tmp = out_path + ".docs.tmp"
+    try:
+        return _write_index(records, out_path, docs_tmp)
+    finally:
+        if os.path.exists(docs_tmp):
+            os.remove(docs_tmp)
+
+def _write_index(records: Iterable[dict], out_path: str, docs_tmp: str) -> int:
+    postings: dict[str, array] = {}
+    doclens = array("I")
+    docoff = array("Q", [0])
+    seen: set[int] = set()
+    with open(docs_tmp, "w+b") as docs:
+        for rec in records:
+            text = (rec.get("text") or "").strip()
+            key = hash((text.lower(), rec.get("url") or ""))
+            if not text or key in seen:
+                continue
+            toks = tokenize(text)
+            if not toks:
+                continue
+            seen.add(key)
+            doc_id = len(doclens)
+            tf: dict[str, int] = {}
+            for t in toks:
+                tf[t] = tf.get(t, 0) + 1
+            for t, n in tf.items():
+                plist = postings.get(t)
+                if plist is None:
+                    plist = postings[t] = array("I")
+                plist.append(doc_id)
+                plist.append(n)
+            doclens.append(len(toks))
+            body = json.dumps(rec, ensure_ascii=False).encode("utf-8")
+            docs.write(body)
+            docoff.append(docoff[-1] + len(body))
+
+        n_docs = len(doclens)
+        n_slots = max(8, 1 << (len(postings) * 2 - 1).bit_length())  # load factor <= 0.5
+        slots: List[tuple[int, int, int]] = [(0, 0, 0)] * n_slots
+        n_postings = 0
+        for term, plist in postings.items():
+            h = _hash(term)
+            i = h % n_slots
+            while slots[i][0] != 0:
+                i = (i + 1) % n_slots
+            slots[i] = (h, n_postings, len(plist) // 2)
+            n_postings += len(plist) // 2
+
+        avg_len = max(1.0, sum(doclens) / n_docs) if n_docs else 1.0
+        docnorm = array("f", (_K1 * (1 - _B + _B * n / avg_len) for n in doclens))
+        if sys.byteorder != "little":
+            docnorm.byteswap()
+            docoff.byteswap()
+
+        off_table = _HEADER.size
+        off_postings = off_table + n_slots * _SLOT.size
+        off_docnorm = off_postings + n_postings * 8
+        off_docoff = off_docnorm + n_docs * 4
+        off_docs = off_docoff + (n_docs + 1) * 8
+
+        tmp = out_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, n_docs, n_slots, avg_len, off_table, off_postings, off_docnorm, off_docoff, off_docs))
+            f.write(b"".join(_SLOT.pack(h, off, df, 0) for h, off, df in slots))
+            for plist in postings.values():  # same order as the offsets above
+                if sys.byteorder != "little":
+                    plist.byteswap()
+                f.write(plist.tobytes())
+            f.write(docnorm.tobytes())
+            f.write(docoff.tobytes())
+            docs.seek(0)
+            shutil.copyfileobj(docs, f)
+    os.replace(tmp, out_path)
+    return n_docs
+
+# --- querying ---------------------------------------------------------------
+
+class FactCheckIndex:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.mtime = os.fstat(self._file.fileno()).st_mtime
+        (magic, self.n_docs, self._n_slots, self._avg_len, self._off_table,
+         self._off_postings, self._off_docnorm, self._off_docoff, self._off_docs) = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a fact-check index")
+        mv = memoryview(self._mm)
+        self._postings = mv[self._off_postings:self._off_docnorm].cast("I")
+        self._docnorm = mv[self._off_docnorm:self._off_docoff].cast("f")
+        self._docoff = mv[self._off_docoff:self._off_docs].cast("Q")
+
+    def close(self) -> None:
+        for view in (self._postings, self._docnorm, self._docoff):
+            view.release()
+        self._mm.close()
+        self._file.close()
+
+    def _lookup(self, term: str) -> tuple[int, int]:
+        h = _hash(term)
+        i = h % self._n_slots
+        while True:
+            sh, off, df, _ = _SLOT.unpack_from(self._mm, self._off_table + i * _SLOT.size)
+            if sh == 0:
+                return 0, 0
+            if sh == h:
+                return off, df
+            i = (i + 1) % self._n_slots
+
+    def doc(self, doc_id: int) -> dict:
+        start, end = self._docoff[doc_id], self._docoff[doc_id + 1]
+        return json.loads(self._mm[self._off_docs + start:self._off_docs + end])
+
+    def search(self, query: str, k: int = 3, min_match: float = 0.0) -> List[tuple[float, dict]]:
+        """
+        BM25 top-k. `min_match` is the share of the query's IDF mass a hit
+        must cover (0-1), so "no good match" is scale-free.
+
+        Terms are taken rarest first until the ones left over could not reach
+        min_match on their own: every hit contains one of those rare terms, so
+        only their (short) postings are walked. The common terms are then
+        binary-searched per candidate (postings are sorted by doc id), and a
+        candidate is dropped as soon as it can no longer reach min_match.
+        """
+        n = self.n_docs
+        if not n:
+            return []
+        docnorm, postings = self._docnorm, self._postings
+        terms = []
+        for term in dict.fromkeys(tokenize(query)):
+            off, df = self._lookup(term)
+            terms.append((math.log(1 + (n - df + 0.5) / (df + 0.5)), off, df))
+        total_idf = sum(idf for idf, _, _ in terms)
+        if total_idf <= 0:
+            return []
+        terms.sort(key=lambda t: -t[0])
+        need = min_match * total_idf - 1e-9
+        rest, walk = total_idf, 0
+        while walk < len(terms) and rest >= need:
+            rest -= terms[walk][0]
+            walk += 1
+
+        scores: dict[int, float] = {}
+        matched: dict[int, float] = {}
+        for idf, off, df in terms[:walk]:
+            plist = postings[off * 2:(off + df) * 2].tolist()
+            for doc_id, tf in zip(plist[::2], plist[1::2]):
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (_K1 + 1) / (tf + docnorm[doc_id])
+                matched[doc_id] = matched.get(doc_id, 0.0) + idf
+        for idf, off, df in terms[walk:]:
+            candidates = [d for d in scores if matched[d] + rest >= need]
+            if not candidates:
+                return []
+            rest -= idf
+            ids = postings[off * 2:(off + df) * 2:2]
+            for doc_id in candidates:
+                i = bisect.bisect_left(ids, doc_id)
+                if i < df and ids[i] == doc_id:
+                    tf = postings[(off + i) * 2 + 1]
+                    scores[doc_id] += idf * tf * (_K1 + 1) / (tf + docnorm[doc_id])
+                    matched[doc_id] += idf
+        good = ((s, d) for d, s in scores.items() if matched[d] >= need)
+        return [(s, self.doc(d)) for s, d in heapq.nlargest(k, good)]
+
+_RECHECK_S = 30  # how often get_index() stats the file for a rebuilt copy
+_REFRESH_RETRY_S = 900  # after a failed refresh
+_index: Optional[FactCheckIndex] = None
+_retired: Optional[FactCheckIndex] = None
+_checked_at = 0.0
+_swap_lock = threading.Lock()
+
+def get_index() -> Optional[FactCheckIndex]:
+    """The shared index, reopened when the file on disk is replaced; None if not configured."""
+    global _index, _retired, _checked_at
+    path = get_settings().FACTCHECK_INDEX_PATH
+    if not path:
+        return None
+    if _index is not None and time.monotonic() - _checked_at < _RECHECK_S:
+        return _index
+    with _swap_lock:  # lookup() runs in worker threads
+        now = time.monotonic()
+        if _index is not None and now - _checked_at < _RECHECK_S:
+            return _index
+        _checked_at = now
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return _index
+        if _index is None or mtime != _index.mtime:
+            # A search may still be reading the previous copy; close it one swap later
+            if _retired is not None:
+                _retired.close()
+            _retired, _index = _index, FactCheckIndex(path)
+    return _index
+
+def lookup(query: str, n: int = 2) -> List[dict]:
+    """Local ClaimReview matches as search snippets ({title, snippet, url}); [] if none are good."""
+    idx = get_index()
+    if idx is None:
+        return []
+    out = []
+    for _, rec in idx.search(query, k=n, min_match=get_settings().FACTCHECK_INDEX_MIN_MATCH):
+        rating = f" Rated: {rec['rating']}." if rec.get("rating") else ""
+        out.append({
+            "title": rec.get("publisher") or "Fact check",
+            "snippet": f"{rec['text']}{rating}",
+            "url": rec.get("url"),
+        })
+    return out
+
+def refresh(feed_url: str, path: str) -> Optional[int]:
+    """
+    Download the ClaimReview feed next to `path` and rebuild the index there.
+    Returns the doc count, or None if another process is already refreshing.
+    Blocking; the server runs it in a worker thread.
+    """
+    import fcntl
+    import httpx
+
+    with open(path + ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        download = path + ".download"
+        try:
+            with httpx.stream("GET", feed_url, timeout=300, follow_redirects=True) as r:
+                r.raise_for_status()
+                with open(download, "wb") as f:
+                    for chunk in r.iter_bytes(1 << 20):
+                        f.write(chunk)
+            return build_index(load_dump(download), path)
+        finally:
+            if os.path.exists(download):
+                os.remove(download)
+
+async def refresh_periodically() -> None:
+    """Rebuild the index whenever it is older than FACTCHECK_REFRESH_INTERVAL_S (startup task)."""
+    s = get_settings()
+    interval = s.FACTCHECK_REFRESH_INTERVAL_S
+    while True:
+        try:
+            age = time.time() - os.stat(s.FACTCHECK_INDEX_PATH).st_mtime
+        except OSError:
+            age = float("inf")
+        if age >= interval:
+            try:
+                n = await asyncio.to_thread(refresh, s.FACTCHECK_FEED_URL, s.FACTCHECK_INDEX_PATH)
+                if n is not None:
+                    logger.info(f"Fact-check index rebuilt: {n} fact checks")
+                age = 0.0
+            except Exception as e:
+                logger.error(f"❌ Fact-check index refresh failed: {e}")
+                age = interval - min(interval, _REFRESH_RETRY_S)  # retry sooner than a full interval
+        await asyncio.sleep(max(_RECHECK_S, interval - age))
+
+def _refresh() -> None:
+    s = get_settings()
+    if not s.FACTCHECK_FEED_URL or not s.FACTCHECK_INDEX_PATH:
+        sys.exit("FACTCHECK_FEED_URL and FACTCHECK_INDEX_PATH must be set")
+    n = refresh(s.FACTCHECK_FEED_URL, s.FACTCHECK_INDEX_PATH)
+    if n is None:
+        sys.exit(f"another process is refreshing {s.FACTCHECK_INDEX_PATH}")
+    print(f"indexed {n} fact checks into {s.FACTCHECK_INDEX_PATH}")
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "build" and len(sys.argv) == 4:
+        n = build_index(load_dump(sys.argv[2]), sys.argv[3])
+        print(f"indexed {n} fact checks into {sys.argv[3]}")
+    elif cmd == "refresh":
+        _refresh()
+    else:
+        sys.exit(__doc__)
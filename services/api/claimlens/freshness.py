@@ -0,0 +1,172 @@
+# services/api/claimlens/freshness.py
+"""
+Stale-while-revalidate for saved reports.
+
+A saved report is served as-is, but if it is older than REPORT_MAX_AGE_S or
+was produced by a different MODEL_PRIMARY / PROMPT_VERSION, a background
+re-analysis replaces its data in place (same reportId). At most one refresh
+runs per video, and REFRESH_CONCURRENCY caps them all together.
+
+Refreshes only ever replace a report with MODEL_PRIMARY output: they are
+skipped while the primary model's breaker is open, and a result that came
+from MODEL_FALLBACK is dropped (it would just be "model"-stale again).
+"""
+import asyncio, logging
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from .deps import get_settings
+from .models import AnalyzeRequest, AnalyzeResponse
+from .prompts import PROMPT_VERSION
+from .pipeline import run_pipeline, consensus_from
+from .openai_client import answered_model, get_breaker, CircuitBreaker
+from .deadline import without_deadline
+from .report_search import index_report
+from . import persistence
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+_inflight: dict[str, asyncio.Task] = {}
+_refresh_sem: asyncio.Semaphore | None = None
+_bulk: asyncio.Task | None = None
+
+def _limiter() -> asyncio.Semaphore:
+    global _refresh_sem
+    if _refresh_sem is None:
+        _refresh_sem = asyncio.Semaphore(get_settings().REFRESH_CONCURRENCY)
+    return _refresh_sem
+
+def staleness(row: dict) -> Optional[str]:
+    """Why the report in `row` needs refreshing ("model", "prompt", "partial", "age"), or None."""
+    from .db import parse_timestamp
+
+    s = get_settings()
+    meta = (row.get("data") or {}).get("meta") or {}
+    if meta.get("model") != s.MODEL_PRIMARY:
+        return "model"
+    if meta.get("promptVersion") != PROMPT_VERSION:
+        return "prompt"
+    try:
+        analyzed = parse_timestamp(meta.get("analyzedAt") or row.get("created_at"))
+    except ValueError:
+        analyzed = None
+    if analyzed is None:
+        return "age"
+    if analyzed.tzinfo is None:
+        analyzed = analyzed.replace(tzinfo=timezone.utc)
+    age_s = (datetime.now(timezone.utc) - analyzed).total_seconds()
+    if meta.get("partial") and age_s > s.PARTIAL_REPORT_GRACE_S:
+        return "partial"
+    if age_s > s.REPORT_MAX_AGE_S:
+        return "age"
+    return None
+
+async def _refresh(row: dict, reason: str) -> None:
+    s = get_settings()
+    data = row.get("data") or {}
+    video_id = row.get("video_id") or (data.get("video") or {}).get("id")
+    async with _limiter():
+        if get_breaker(s.MODEL_PRIMARY).state != CircuitBreaker.CLOSED:
+            # Don't pile onto a failing model or overwrite a report with fallback output
+            logger.info(f"Skipping refresh of report {row.get('id')}: {s.MODEL_PRIMARY} breaker is not closed")
+            return
+        logger.info(f"♻️  Refreshing report {row.get('id')} for {video_id} ({reason})")
+        try:
+            req = AnalyzeRequest(url=f"https://www.youtube.com/watch?v={video_id}")
+            result = await run_pipeline(req)
+            if result.meta.get("model") != s.MODEL_PRIMARY:
+                logger.info(f"Dropping refresh of report {row.get('id')}: answered by {result.meta.get('model')}")
+                return
+            result.reportId = row["id"]
+            report_data = jsonable_encoder(result)
+            if not await persistence.queue.update(row["id"], report_data):
+                # Deleted while we were re-analyzing: don't resurrect it in search
+                logger.info(f"Report {row.get('id')} is gone; dropping its refresh")
+                return
+            index_report(row["id"], report_data, row.get("created_at"))
+        except Exception as e:
+            logger.error(f"❌ Refresh of report {row.get('id')} failed: {e}")
+
+def schedule_refresh(row: dict, reason: str) -> Optional[asyncio.Task]:
+    """Start a background refresh unless one is already running for this video."""
+    video_id = row.get("video_id") or ((row.get("data") or {}).get("video") or {}).get("id")
+    if not video_id or not row.get("id"):
+        return None
+    if video_id in _inflight:
+        return None
+    task = asyncio.create_task(_refresh(row, reason))
+    _inflight[video_id] = task
+    task.add_done_callback(lambda _t: _inflight.pop(video_id, None))
+    return task
+
+async def reanalyze_outdated(per_min: int, page_size: int = 50) -> Tuple[int, int]:
+    """
+    Walk every saved report and refresh the stale ones, starting at most
+    `per_min` refreshes per minute and never more than REFRESH_CONCURRENCY
+    at once, so tasks don't pile up behind the limiter. Returns (scanned, scheduled).
+    """
+    from .db import db
+
+    interval = 60.0 / max(1, per_min)
+    cap = max(1, get_settings().REFRESH_CONCURRENCY)
+    scanned = scheduled = offset = 0
+    while True:
+        page = await db.get_saved_reports(limit=page_size, offset=offset)
+        for row in page["reports"]:
+            scanned += 1
+            reason = staleness(row)
+            if not reason:
+                continue
+            while len(_inflight) >= cap:
+                await asyncio.wait(set(_inflight.values()), return_when=asyncio.FIRST_COMPLETED)
+            if schedule_refresh(row, reason):
+                scheduled += 1
+                await asyncio.sleep(interval)
+        if not page["has_more"]:
+            break
+        offset += page_size
+    logger.info(f"Bulk re-analysis done: scanned {scanned}, scheduled {scheduled}")
+    return scanned, scheduled
+
+def start_bulk_reanalysis(per_min: int) -> bool:
+    """Kick off reanalyze_outdated() in the background; False if one is already running."""
+    global _bulk
+    if _bulk is not None and not _bulk.done():
+        return False
+    _bulk = asyncio.create_task(reanalyze_outdated(per_min))
+    return True
+
+async def _patch_late_claims(report_id: str, result: AnalyzeResponse, tasks: list) -> None:
+    verified = await asyncio.gather(*tasks)
+    try:
+        cons = await consensus_from(verified)
+    except Exception as e:
+        logger.warning(f"Consensus for late claims failed: {e}")
+        cons = result.consensus.model_dump()
+    report_data = jsonable_encoder(result)
+    report_data["claims"] = jsonable_encoder(verified)
+    report_data["consensus"] = cons
+    report_data["meta"].pop("pendingClaims", None)
+    report_data["meta"]["partial"] = False
+    # The request's usage dict also collected the late calls (shared via the task context)
+    usage = result.meta.get("tokens") or {}
+    report_data["meta"]["tokens"] = jsonable_encoder(usage)
+    report_data["meta"]["model"] = answered_model(usage)
+    try:
+        if not await persistence.queue.update(report_id, report_data):
+            logger.info(f"Report {report_id} is gone; dropping its late claims")
+            return
+        index_report(report_id, report_data)
+        logger.info(f"✅ Patched {len(tasks)} late claims into report {report_id}")
+    except Exception as e:
+        logger.error(f"❌ Failed to patch late claims into report {report_id}: {e}")
+
+def schedule_late_claims(result: AnalyzeResponse) -> Optional[asyncio.Task]:
+    """Once a partial report is saved, finish its timed-out claims and patch them in."""
+    tasks = result._late
+    if not tasks or not result.reportId:
+        return None
+    result._late = None
+    return asyncio.create_task(
+        _patch_late_claims(result.reportId, result, tasks), context=without_deadline()
+    )
@@ -0,0 +1,72 @@
+# services/api/claimlens/http_cache.py
+"""HTTP caching helpers: weak ETags, conditional GETs, Cache-Control and gzip."""
+import hashlib, json
+from typing import Any
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from starlette.middleware.gzip import GZipMiddleware
+
+def _canonical(payload: Any) -> bytes:
+    # Stable byte representation: sorted keys, no whitespace, UTF-8
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    ).encode("utf-8")
+
+def compute_etag(body: bytes) -> str:
+    """
+    Weak ETag for a response body. Weak because GZipMiddleware may send the
+    same representation gzip- or identity-encoded under one tag.
+    """
+    return 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    If-None-Match uses weak comparison (RFC 9110 §13.1.2), so a W/ prefix
+    on either side is ignored. Accepts '*' and comma-separated lists.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    ours = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == ours:
+            return True
+    return False
+
+def cache_control_header(max_age: int, s_maxage: int | None = None) -> str:
+    parts = ["public", f"max-age={max_age}"]
+    if s_maxage is not None:
+        parts.append(f"s-maxage={s_maxage}")
+    return ", ".join(parts)
+
+def cached_json_response(request: Request, payload: Any, *, cache_control: str) -> Response:
+    """
+    Serialize `payload` once, derive a weak ETag from the bytes and answer
+    304 Not Modified when the client already holds that representation.
+    """
+    body = _canonical(payload)
+    etag = compute_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves `exclude_paths` alone. The gzip responder
+    buffers until the body ends, so streamed NDJSON would otherwise reach
+    the client all at once instead of line by line.
+    """
+    def __init__(self, app, minimum_size: int = 500, exclude_paths: tuple[str, ...] = ()) -> None:
+        super().__init__(app, minimum_size=minimum_size)
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
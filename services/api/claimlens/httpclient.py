@@ -0,0 +1,26 @@
+# services/api/claimlens/httpclient.py
+"""Process-wide httpx client so upstream calls reuse pooled (HTTP/2) connections."""
+import httpx
+from .deps import get_settings
+
+_client: httpx.AsyncClient | None = None
+
+def get_http() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        s = get_settings()
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=s.HTTP_TIMEOUT_S,
+            limits=httpx.Limits(
+                max_connections=s.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=s.HTTP_MAX_CONNECTIONS // 2,
+            ),
+        )
+    return _client
+
+async def close_http() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
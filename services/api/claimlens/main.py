@@ -1,77 +1,203 @@
 # services/api/claimlens/main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-import logging, os
-from .models import AnalyzeRequest, AnalyzeResponse, SavedReportsRequest, SavedReportsResponse, SavedReportSummary
-from .pipeline import run_pipeline
+from fastapi.responses import StreamingResponse, PlainTextResponse
+import asyncio, json, logging, os
+from .models import (
+    AnalyzeRequest, AnalyzeBatchRequest, AnalyzeResponse, Rating, SavedReportsRequest,
+    SavedReportsResponse, SavedReportSummary, SearchHit, SearchResponse,
+)
+from .pipeline import run_pipeline, TranscriptPending
+from .batch import run_batch
+from .report_search import search_reports, matching_claims, index_report, unindex_report, warm_index
+from .freshness import staleness, schedule_refresh, start_bulk_reanalysis, schedule_late_claims
+from .deadline import request_deadline, DeadlineExceeded
 from .deps import get_settings
 from dotenv import load_dotenv
 from pathlib import Path
 from fastapi.encoders import jsonable_encoder
-from .youtube import extract_video_id
-from datetime import datetime
+from .youtube import extract_video_id, CaptionFetchError
+from .httpclient import close_http
+from . import factcheck_index, metrics, persistence
+from .http_cache import cached_json_response, cache_control_header, SelectiveGZipMiddleware
+from .admission import AdmissionMiddleware
+from .prompt_budget import warm_encoder
+from datetime import datetime, timezone
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
 s = get_settings()
 app = FastAPI(title="ClaimLens API")
 
+if s.ADMISSION_ENABLED:
+    # Innermost, so shed 503s still get CORS headers
+    app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=s.CORS_ALLOW_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+# Compress large JSON bodies (report payloads) when the client accepts gzip;
+# the NDJSON batch stream stays uncompressed so each line is sent as it's ready
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=s.GZIP_MIN_BYTES, exclude_paths=("/analyze/batch",))
+
+if s.CLAIMLENS_DEBUG:
+    # Opt-in per-request profiling; not even installed unless debugging
+    from .profiling import profiling_middleware
+    app.middleware("http")(profiling_middleware)
+
+@app.on_event("startup")
+async def _start_persistence():
+    if s.PERSIST_WRITE_BEHIND:
+        persistence.queue.start()
+
+@app.on_event("shutdown")
+async def _close_http():
+    if s.PERSIST_WRITE_BEHIND:
+        await persistence.queue.stop()
+    await close_http()
+
+@app.on_event("startup")
+async def _warm_tokenizer():
+    # Loading the BPE file blocks for a moment (or, without a cache, downloads it)
+    asyncio.create_task(asyncio.to_thread(warm_encoder))
+
+@app.on_event("startup")
+async def _warm_search_index():
+    if s.SEARCH_BACKEND == "memory":
+        async def _warm():
+            try:
+                await warm_index()
+            except Exception as e:
+                logging.warning(f"Search index warm-up failed: {e}")
+        asyncio.create_task(_warm())
+
+@app.on_event("startup")
+async def _refresh_factchecks():
+    if s.FACTCHECK_FEED_URL and s.FACTCHECK_INDEX_PATH and s.FACTCHECK_REFRESH_INTERVAL_S > 0:
+        asyncio.create_task(factcheck_index.refresh_periodically())
 
 @app.get("/health")
 async def health():
     return {"ok": True}
 
+async def _existing_report(url: str) -> AnalyzeResponse | None:
+    """Latest saved report for the video behind `url`, or None."""
+    try:
+        from .db import db
+        video_id = extract_video_id(url)
+        if video_id:
+            existing = (
+                persistence.queue.latest_by_video(video_id)
+                or await db.get_latest_report_by_video_id(video_id)
+            )
+            if existing and existing.get("data"):
+                # Copy: the row may be a pending write-behind buffer entry
+                data = dict(existing["data"] or {})
+                data["meta"] = dict(data.get("meta") or {})
+                data["reportId"] = existing.get("id")
+                # Serve it now; if it's old or from another model/prompt, refresh in the background
+                reason = staleness(existing)
+                if reason:
+                    schedule_refresh(existing, reason)
+                    data["meta"]["stale"] = reason
+                return AnalyzeResponse(**data)
+    except Exception as e:
+        logging.warning(f"Pre-check for existing report failed: {e}")
+    return None
+
+async def _save_report(result: AnalyzeResponse) -> None:
+    """Persist `result` and set its reportId; failures are logged, not raised."""
+    try:
+        # Ensure JSON-serializable payload (handles HttpUrl, datetime, etc.)
+        report_data = jsonable_encoder(result)
+        if s.PERSIST_WRITE_BEHIND:
+            # Id is allocated now; the row reaches the database in the background
+            report_id = persistence.queue.save(report_data)
+        else:
+            from .db import db
+            report_id = await db.save_report(report_data)
+        # Add the report ID to the response
+        result.reportId = report_id
+        index_report(report_id, report_data, datetime.now(timezone.utc).isoformat())
+    except Exception as e:
+        # Log the error but don't fail the request
+        logging.error(f"Failed to save report: {str(e)}")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/analyze", response_model=AnalyzeResponse)
 async def analyze(req: AnalyzeRequest):
     try:
         # Short-circuit: if we've already analyzed this video, return the latest saved report
-        try:
-            from .db import db
-            video_id = extract_video_id(str(req.url))
-            if video_id:
-                existing = await db.get_latest_report_by_video_id(video_id)
-                if existing and existing.get("data"):
-                    data = existing["data"] or {}
-                    data["reportId"] = existing.get("id")
-                    return AnalyzeResponse(**data)
-        except Exception as e:
-            logging.warning(f"Pre-check for existing report failed: {e}")
-        
-        # Run the analysis pipeline
-        result = await run_pipeline(req)
-        
-        # Save the report to the database
-        try:
-            from .db import db
-            # Ensure JSON-serializable payload (handles HttpUrl, datetime, etc.)
-            report_data = jsonable_encoder(result)
-            report_id = await db.save_report(report_data)
-            # Add the report ID to the response
-            result.reportId = report_id
-        except Exception as e:
-            # Log the error but don't fail the request
-            import logging
-            logging.error(f"Failed to save report: {str(e)}")
+        existing = await _existing_report(str(req.url))
+        if existing:
+            return existing
+        
+        # Run the analysis pipeline within the request's latency budget
+        budget_s = s.REQUEST_DEADLINE_S if req.timeoutMs is None else req.timeoutMs / 1000
+        with request_deadline(min(budget_s, s.REQUEST_DEADLINE_MAX_S)):
+            result = await run_pipeline(req)
+        
+        # Save the report to the database; timed-out claims are patched in later
+        await _save_report(result)
+        schedule_late_claims(result)
             
         return result
+    except TranscriptPending as e:
+        # Speech-to-text keeps running; the retry picks up its transcript
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after_s)})
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Deadline exceeded before any claims could be verified")
+    except CaptionFetchError as e:
+        # Captions exist but YouTube didn't serve them; not a reason to run STT
+        raise HTTPException(status_code=502, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.exception("Error in analyze endpoint")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/analyze/batch")
+async def analyze_batch(req: AnalyzeBatchRequest):
+    """
+    Analyze many videos at once. Streams NDJSON, one line per URL as soon as
+    that video is done: {"url", "ok", "report"} or {"url", "ok", "error"}.
+    """
+    urls = [str(u) for u in req.urls]
+    existing = await asyncio.gather(*[_existing_report(u) for u in urls])
+    fresh = [u for u, e in zip(urls, existing) if e is None]
+
+    async def _lines():
+        for url, report in zip(urls, existing):
+            if report is not None:
+                yield json.dumps({"url": url, "ok": True, "report": jsonable_encoder(report)}) + "\n"
+        if not fresh:
+            return
+        async for url, result in run_batch(req.model_copy(update={"urls": fresh})):
+            if isinstance(result, (ValueError, CaptionFetchError)):
+                line = {"url": url, "ok": False, "error": str(result)}
+            elif isinstance(result, Exception):
+                logging.error(f"Batch analysis failed for {url}: {result!r}")
+                line = {"url": url, "ok": False, "error": "Internal server error"}
+            else:
+                await _save_report(result)
+                line = {"url": url, "ok": True, "report": jsonable_encoder(result)}
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
 @app.get("/saved-reports", response_model=SavedReportsResponse)
-async def get_saved_reports(limit: int = 5, offset: int = 0):
+async def get_saved_reports(request: Request, limit: int = 5, offset: int = 0):
     """Get saved reports with pagination."""
     try:
-        from .db import db
+        from .db import db, parse_timestamp
         
         # Validate parameters
         if limit < 1 or limit > 50:
@@ -92,20 +218,7 @@ async def get_saved_reports(limit: int = 5, offset: int = 0):
                 # Parse created_at string to datetime
                 created_at_str = report_row.get("created_at")
                 try:
-                    if created_at_str:
-                        # Handle both Z and +00:00 timezone formats, and normalize microseconds
-                        normalized_str = created_at_str.replace('Z', '+00:00')
-                        # Ensure microseconds are exactly 6 digits (Python requirement)
-                        if '.' in normalized_str and '+' in normalized_str:
-                            dt_part, tz_part = normalized_str.rsplit('+', 1)
-                            if '.' in dt_part:
-                                base_part, microsec_part = dt_part.split('.')
-                                # Pad or truncate to exactly 6 digits
-                                microsec_part = microsec_part.ljust(6, '0')[:6]
-                                normalized_str = f"{base_part}.{microsec_part}+{tz_part}"
-                        created_at = datetime.fromisoformat(normalized_str)
-                    else:
-                        created_at = datetime.now()
+                    created_at = parse_timestamp(created_at_str) or datetime.now()
                 except Exception as e:
                     logging.warning(f"Failed to parse datetime '{created_at_str}' for report {report_row.get('id')}: {e}")
                     created_at = datetime.now()
@@ -121,11 +234,16 @@ async def get_saved_reports(limit: int = 5, offset: int = 0):
                 logging.warning(f"Failed to parse saved report {report_row.get('id')}: {e}")
                 continue
         
-        return SavedReportsResponse(
+        response = SavedReportsResponse(
             reports=reports,
             total=result["total"],
             has_more=result["has_more"]
         )
+        # The list changes as reports are added/deleted: always revalidate, but cheaply via ETag
+        return cached_json_response(
+            request, response,
+            cache_control=cache_control_header(s.REPORTS_LIST_CACHE_MAX_AGE_S),
+        )
         
     except HTTPException:
         raise
@@ -133,13 +251,52 @@ async def get_saved_reports(limit: int = 5, offset: int = 0):
         logging.exception("Error in get_saved_reports endpoint")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/search", response_model=SearchResponse)
+async def search(q: str, rating: Rating | None = None, limit: int = 10, cursor: str | None = None):
+    """Ranked search over saved reports' titles, channels, summaries and claims."""
+    try:
+        from .db import parse_timestamp
+        
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="Query must not be empty")
+        if limit < 1 or limit > 50:
+            raise HTTPException(status_code=400, detail="Limit must be between 1 and 50")
+        
+        try:
+            hits, next_cursor = await search_reports(q, rating=rating, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        results = []
+        for score, row in hits:
+            data = row.get("data") or {}
+            try:
+                results.append(SearchHit(
+                    reportId=str(row["id"]),
+                    video=data.get("video", {}),
+                    consensus=data.get("consensus", {}),
+                    matchedClaims=matching_claims(data, q, rating),
+                    score=score,
+                    created_at=parse_timestamp(row.get("created_at")) or datetime.now(),
+                ))
+            except Exception as e:
+                logging.warning(f"Failed to parse search hit {row.get('id')}: {e}")
+        
+        return SearchResponse(results=results, nextCursor=next_cursor)
+    
+    except HTTPException:
+        raise
+    except Exception:
+        logging.exception("Error in search endpoint")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.get("/saved-reports/{report_id}", response_model=AnalyzeResponse)
-async def get_saved_report(report_id: str):
+async def get_saved_report(report_id: str, request: Request):
     """Get a specific saved report by ID."""
     try:
         from .db import db
         
-        report_row = await db.get_report_by_id(report_id)
+        report_row = persistence.queue.get(report_id) or await db.get_report_by_id(report_id)
         if not report_row:
             raise HTTPException(status_code=404, detail="Report not found")
         
@@ -150,7 +307,13 @@ async def get_saved_report(report_id: str):
         # Add the report ID to the response
         data["reportId"] = report_row["id"]
         
-        return AnalyzeResponse(**data)
+        # Reports can be refreshed in place, so apps and CDN edges reuse them only briefly;
+        # partial ones are about to get their late claims, so always revalidate those
+        if (data.get("meta") or {}).get("partial"):
+            cache_control = "no-cache"
+        else:
+            cache_control = cache_control_header(s.REPORT_CACHE_MAX_AGE_S, s.REPORT_CACHE_S_MAXAGE_S)
+        return cached_json_response(request, AnalyzeResponse(**data), cache_control=cache_control)
         
     except HTTPException:
         raise
@@ -163,9 +326,11 @@ async def delete_saved_report(report_id: str):
     """Delete a saved report by ID."""
     try:
         from .db import db
-        deleted = await db.delete_report(report_id)
+        discarded = persistence.queue.discard(report_id)
+        deleted = await db.delete_report(report_id) or discarded
         if not deleted:
             raise HTTPException(status_code=404, detail="Report not found")
+        unindex_report(report_id)
         # 204 No Content
         return
     except HTTPException:
@@ -173,3 +338,11 @@ async def delete_saved_report(report_id: str):
     except Exception:
         logging.exception("Error in delete_saved_report endpoint")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.post("/admin/reanalyze", status_code=202)
+async def admin_reanalyze(x_admin_token: str | None = Header(default=None)):
+    """Re-analyze every stale/outdated saved report in the background within REANALYZE_PER_MIN."""
+    if not s.ADMIN_TOKEN or x_admin_token != s.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    started = start_bulk_reanalysis(s.REANALYZE_PER_MIN)
+    return {"started": started, "perMin": s.REANALYZE_PER_MIN}
@@ -0,0 +1,46 @@
+# services/api/claimlens/metrics.py
+"""
+Minimal in-process metrics, rendered in Prometheus text format at /metrics.
+Counters only go up; gauges are set to the latest value.
+"""
+from typing import Dict, Tuple
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_counters: Dict[_Key, float] = {}
+_gauges: Dict[_Key, float] = {}
+_help: Dict[str, Tuple[str, str]] = {}
+
+def _key(name: str, labels: dict) -> _Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name: str, value: float = 1.0, *, doc: str = "", **labels) -> None:
+    _help.setdefault(name, ("counter", doc))
+    k = _key(name, labels)
+    _counters[k] = _counters.get(k, 0.0) + value
+
+def set_gauge(name: str, value: float, *, doc: str = "", **labels) -> None:
+    _help.setdefault(name, ("gauge", doc))
+    _gauges[_key(name, labels)] = value
+
+def value(name: str, **labels) -> float:
+    k = _key(name, labels)
+    return _counters.get(k, _gauges.get(k, 0.0))
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render() -> str:
+    lines = []
+    series = sorted({**_counters, **_gauges}.items())
+    seen = set()
+    for (name, labels), v in series:
+        if name not in seen:
+            seen.add(name)
+            kind, help_text = _help.get(name, ("untyped", ""))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+        label_str = ",".join(f'{k}="{_escape(val)}"' for k, val in labels)
+        lines.append(f"{name}{{{label_str}}} {v:g}" if label_str else f"{name} {v:g}")
+    return "\n".join(lines) + "\n"
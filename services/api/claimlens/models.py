@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl, Field
+from pydantic import BaseModel, HttpUrl, Field, PrivateAttr
 from typing import List, Optional, Literal
 from datetime import datetime
 
@@ -8,6 +8,7 @@ class AnalyzeRequest(BaseModel):
     url: HttpUrl
     locale: str = "en"
     maxClaims: int = 8
+    timeoutMs: Optional[int] = Field(default=None, ge=1000)  # latency budget; capped server-side
 
 class Video(BaseModel):
     id: str; title: str; channel: str; thumbnail: HttpUrl; durationSec: int
@@ -31,6 +32,7 @@ class AnalyzeResponse(BaseModel):
     reportId: str | None = None  # Will be populated by the backend after saving
     meta: dict
     videoSummary: str
+    _late: Optional[list] = PrivateAttr(default=None)  # verification tasks still running past the deadline
 
 class SavedReportSummary(BaseModel):
     id: str
@@ -45,4 +47,20 @@ class SavedReportsRequest(BaseModel):
 class SavedReportsResponse(BaseModel):
     reports: List[SavedReportSummary]
     total: int
-    has_more: bool
\ No newline at end of file
+    has_more: bool
+class AnalyzeBatchRequest(BaseModel):
+    urls: List[HttpUrl] = Field(min_length=1, max_length=50)
+    locale: str = "en"
+    maxClaims: int = 8
+
+class SearchHit(BaseModel):
+    reportId: str
+    video: Video
+    consensus: Consensus
+    matchedClaims: List[Claim]
+    score: float
+    created_at: datetime
+
+class SearchResponse(BaseModel):
+    results: List[SearchHit]
+    nextCursor: Optional[str] = None
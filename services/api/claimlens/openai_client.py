@@ -1,51 +1,263 @@
 # services/api/claimlens/openai_client.py
-import httpx, asyncio, json
+import httpx, asyncio, contextvars, json, random, time
+from collections import deque
 from .deps import get_settings
+from .httpclient import get_http
+from .deadline import timeout_for
+from . import metrics
+
+CHAT_URL = "https://api.openai.com/v1/chat/completions"
+CHAT_ENDPOINT = "chat.completions"
+
+# Per-request token usage by pipeline stage, filled in by chat(stage=...)
+_usage: contextvars.ContextVar[dict | None] = contextvars.ContextVar("claimlens_usage", default=None)
+
+def track_usage() -> dict:
+    """Start collecting {stage: {promptTokens, completionTokens, calls, models}} for this request."""
+    usage: dict = {}
+    _usage.set(usage)
+    return usage
+
+def _record_usage(stage: str | None, usage: dict, model: str) -> None:
+    acc = _usage.get()
+    if acc is None or not stage:
+        return
+    row = acc.setdefault(stage, {"promptTokens": 0, "completionTokens": 0, "calls": 0, "models": {}})
+    row["promptTokens"] += int(usage.get("prompt_tokens") or 0)
+    row["completionTokens"] += int(usage.get("completion_tokens") or 0)
+    row["calls"] += 1
+    row["models"][model] = row["models"].get(model, 0) + 1
+
+def answered_model(usage: dict) -> str:
+    """
+    Model to record in a report's meta: MODEL_PRIMARY, unless some call was
+    answered by the fallback, so staleness() refreshes it once the primary is back.
+    """
+    s = get_settings()
+    used = {m for row in usage.values() for m in row.get("models", {})}
+    others = sorted(used - {s.MODEL_PRIMARY, s.MODEL_CASCADE})
+    return others[0] if others else s.MODEL_PRIMARY
 
 class OpenAIError(RuntimeError): ...
 
-async def chat(system: str, user: str, *, model: str | None = None) -> str:
+class RetryableOpenAIError(OpenAIError):
+    """429, 5xx, timeouts and connection errors: worth retrying or failing over."""
+
+class LatencyTracker:
+    """Recent successful latencies for one model; drives the hedge delay."""
+    def __init__(self, size: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def p95(self) -> float | None:
+        if len(self._samples) < 20:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and fails fast for
+    `reset_after_s`; then lets a single probe through (half-open) and
+    closes again on its success. Every allow() that returns True must be
+    followed by success(), failure() or abandon(); a probe that reports
+    nothing for `reset_after_s` is given up on so another can go.
+    """
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, model: str, endpoint: str, threshold: int, reset_after_s: float) -> None:
+        self.model, self.endpoint = model, endpoint
+        self.threshold, self.reset_after_s = threshold, reset_after_s
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._set(self.CLOSED)
+
+    def _set(self, state: str) -> None:
+        self.state = state
+        metrics.set_gauge(
+            "openai_breaker_state", self._GAUGE[state],
+            doc="Circuit breaker state (0 closed, 1 half-open, 2 open)",
+            model=self.model, endpoint=self.endpoint,
+        )
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_after_s:
+            self._set(self.HALF_OPEN)
+            self._probing = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and (
+            not self._probing or time.monotonic() - self._probe_started >= self.reset_after_s
+        ):
+            self._probing = True
+            self._probe_started = time.monotonic()
+            return True
+        return False
+
+    def abandon(self) -> None:
+        """The call ended without saying anything about the model's health (cancelled, or a 4xx)."""
+        self._probing = False
+
+    def success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._set(self.CLOSED)
+
+    def failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            if self.state != self.OPEN:
+                metrics.inc("openai_breaker_opens_total", doc="Times a breaker opened",
+                            model=self.model, endpoint=self.endpoint)
+            self._set(self.OPEN)
+
+_breakers: dict[tuple[str, str], CircuitBreaker] = {}
+_latency: dict[str, LatencyTracker] = {}
+
+def get_breaker(model: str, endpoint: str = CHAT_ENDPOINT) -> CircuitBreaker:
+    key = (model, endpoint)
+    if key not in _breakers:
+        s = get_settings()
+        _breakers[key] = CircuitBreaker(model, endpoint, s.BREAKER_FAILURES, s.BREAKER_RESET_S)
+    return _breakers[key]
+
+def _tracker(model: str) -> LatencyTracker:
+    return _latency.setdefault(model, LatencyTracker())
+
+def hedge_delay(model: str) -> float:
+    s = get_settings()
+    p95 = _tracker(model).p95()
+    return max(s.HEDGE_MIN_DELAY_S, p95) if p95 is not None else s.HEDGE_DEFAULT_DELAY_S
+
+async def _post_once(payload: dict) -> tuple[str, dict]:
+    s = get_settings()
+    t0 = time.monotonic()
+    try:
+        r = await get_http().post(
+            CHAT_URL,
+            headers={
+                "Authorization": f"Bearer {s.OPENAI_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json=payload,
+            timeout=timeout_for(s.HTTP_TIMEOUT_S),
+        )
+    except httpx.TransportError as e:  # timeouts, connection resets
+        raise RetryableOpenAIError(f"OpenAI transport error: {e!r}") from e
+
+    if r.status_code == 401:
+        raise OpenAIError("OpenAI 401 Unauthorized (invalid or missing API key)")
+    if r.status_code == 429:
+        raise RetryableOpenAIError(f"OpenAI 429 Rate limited: {r.text}")
+    if r.status_code >= 500:
+        raise RetryableOpenAIError(f"OpenAI {r.status_code}: {r.text}")
+    try:
+        r.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise OpenAIError(f"OpenAI {r.status_code}: {r.text}") from e
+
+    data = r.json()
+    try:
+        content = data["choices"][0]["message"]["content"]
+    except Exception:
+        raise OpenAIError(f"Unexpected OpenAI response: {json.dumps(data)[:400]}")
+    _tracker(payload["model"]).record(time.monotonic() - t0)
+    return content, data.get("usage") or {}
+
+async def _hedged(payload: dict) -> tuple[str, dict]:
+    """
+    Send the request; if it hasn't answered within the model's p95 latency,
+    send a duplicate and take whichever succeeds first.
+    """
+    s = get_settings()
+    model = payload["model"]
+    first = asyncio.create_task(_post_once(payload))
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay(model) if s.HEDGE_ENABLED else None)
+        if done:
+            return first.result()
+
+        metrics.inc("openai_hedges_total", doc="Duplicate (hedge) requests sent", model=model)
+        second = asyncio.create_task(_post_once(payload))
+        tasks.add(second)
+        pending, err = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    if t is second:
+                        metrics.inc("openai_hedge_wins_total", doc="Hedge requests that answered first", model=model)
+                    return t.result()
+                err = t.exception()
+        raise err
+    finally:
+        for t in tasks:
+            t.cancel()
+
+async def chat(
+    system: str, user: str, *, model: str | None = None,
+    stage: str | None = None, max_tokens: int | None = None,
+) -> str:
     s = get_settings()
     if not s.OPENAI_API_KEY:
         raise OpenAIError("OPENAI_API_KEY not set")
 
-    payload = {
-        "model": model or s.MODEL_PRIMARY,
-        "temperature": 0.2,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-    }
-
-    async with httpx.AsyncClient(timeout=s.HTTP_TIMEOUT_S) as cx:
-        # simple retry on 5xx only, one fallback on model
-        for attempt in range(2):
-            r = await cx.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {s.OPENAI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-            )
-            if r.status_code >= 500 and attempt == 0 and payload["model"] != s.MODEL_FALLBACK:
-                payload["model"] = s.MODEL_FALLBACK
-                await asyncio.sleep(0.5)
-                continue
+    primary = model or s.MODEL_PRIMARY
+    chain = [primary] + ([s.MODEL_FALLBACK] if s.MODEL_FALLBACK and s.MODEL_FALLBACK != primary else [])
+    last_err: OpenAIError | None = None
 
-            if r.status_code == 401:
-                raise OpenAIError("OpenAI 401 Unauthorized (invalid or missing API key)")
-            if r.status_code == 429:
-                raise OpenAIError(f"OpenAI 429 Rate limited: {r.text}")
+    for m in chain:
+        breaker = get_breaker(m)
+        payload = {
+            "model": m,
+            "temperature": 0.2,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+        }
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        for attempt in range(s.OPENAI_MAX_RETRIES + 1):
+            # Fail fast while the breaker is open and go straight to the next model
+            if not breaker.allow():
+                metrics.inc("openai_breaker_rejections_total", doc="Calls skipped by an open breaker", model=m)
+                last_err = last_err or OpenAIError(f"Circuit open for {m}")
+                break
+            probing = breaker.state == CircuitBreaker.HALF_OPEN
             try:
-                r.raise_for_status()
-            except httpx.HTTPStatusError as e:
-                raise OpenAIError(f"OpenAI {r.status_code}: {r.text}") from e
+                out, usage = await _hedged(payload)
+            except RetryableOpenAIError as e:
+                breaker.failure()
+                last_err = e
+                if attempt < s.OPENAI_MAX_RETRIES:
+                    # exponential backoff with full jitter, never past the request deadline
+                    cap = min(s.OPENAI_BACKOFF_MAX_S, s.OPENAI_BACKOFF_BASE_S * 2 ** attempt)
+                    await asyncio.sleep(timeout_for(random.uniform(0, cap)))
+                continue
+            except OpenAIError:
+                # 401/400/bad JSON: not a sign the model is down, so it only counts
+                # when it was the half-open probe (which must end either way)
+                if probing:
+                    breaker.failure()
+                else:
+                    breaker.abandon()
+                raise
+            except BaseException:
+                # Cancelled (deadline, client gone): release the probe without judging the model
+                breaker.abandon()
+                raise
+            breaker.success()
+            _record_usage(stage, usage, m)
+            return out
 
-            data = r.json()
-            try:
-                return data["choices"][0]["message"]["content"]
-            except Exception:
-                raise OpenAIError(f"Unexpected OpenAI response: {json.dumps(data)[:400]}")
-    # unreachable
+    raise last_err or OpenAIError("OpenAI request failed")
@@ -0,0 +1,254 @@
+# services/api/claimlens/persistence.py
+"""
+Write-behind persistence for reports.
+
+save() pre-allocates the reportId and returns immediately; a background
+flusher upserts pending reports to Supabase in batches (off the event loop,
+since the client is blocking), retrying with backoff. Reads of not-yet-flushed
+ids are served from the buffer.
+
+Pending reports are mirrored to a spill so they survive a restart:
+- REDIS_URL set: a Redis hash (PERSIST_SPILL_REDIS_KEY, field = report id).
+  Every instance adds and removes only its own rows and adopts whatever is
+  left in the hash when it starts, so rows from a stopped instance get flushed.
+- otherwise PERSIST_SPILL_PATH. This is best-effort only: on Cloud Run /tmp is
+  in-memory and disappears with the instance, so it covers a crash-restart of
+  the process, not a scale-in or redeploy.
+
+A report deleted while its batch is being written is tombstoned and deleted
+from the database again once that write has finished.
+"""
+import asyncio, json, logging, os, random, uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+from .deps import get_settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindQueue:
+    def __init__(self) -> None:
+        self._pending: Dict[str, Dict[str, Any]] = {}   # id -> row
+        self._versions: Dict[str, int] = {}             # bumped on every change
+        self._writing: Set[str] = set()                 # ids in the batch being upserted
+        self._tombstones: Set[str] = set()              # discarded while being written
+        self._spilled: Set[str] = set()                 # ids this instance has in the Redis spill
+        self._redis = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # --- writes -----------------------------------------------------------
+
+    def save(self, report_data: Dict[str, Any]) -> str:
+        """Queue a new report and return its id (a pending report for the same video is replaced)."""
+        video_id = (report_data.get("video") or {}).get("id")
+        if video_id:
+            pending = self.latest_by_video(video_id)
+            if pending:
+                self._put({**pending, "data": report_data})
+                return pending["id"]
+        report_id = str(uuid.uuid4())
+        self._put({
+            "id": report_id,
+            "data": report_data,
+            "video_id": video_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+        return report_id
+
+    async def update(self, report_id: str, report_data: Dict[str, Any]) -> bool:
+        """Replace a report's data, in the buffer if it hasn't been flushed yet."""
+        if report_id in self._tombstones:
+            return False
+        row = self._pending.get(report_id)
+        if row is not None:
+            self._put({**row, "data": report_data})
+            return True
+        from .db import db
+        return await db.update_report(report_id, report_data)
+
+    def discard(self, report_id: str) -> bool:
+        """Drop a pending report (e.g. deleted before it was flushed)."""
+        if report_id in self._writing:
+            # The in-flight upsert may land after the caller's delete; undo it afterwards
+            self._tombstones.add(report_id)
+        self._versions.pop(report_id, None)
+        return self._pending.pop(report_id, None) is not None
+
+    def _put(self, row: Dict[str, Any]) -> None:
+        self._pending[row["id"]] = row
+        self._versions[row["id"]] = self._versions.get(row["id"], 0) + 1
+        metrics.set_gauge("persist_pending", len(self._pending), doc="Reports waiting to be written")
+        self._wake.set()
+
+    # --- reads ------------------------------------------------------------
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        return self._pending.get(report_id)
+
+    def latest_by_video(self, video_id: str) -> Optional[Dict[str, Any]]:
+        rows = [r for r in self._pending.values() if r.get("video_id") == video_id]
+        return max(rows, key=lambda r: r["created_at"]) if rows else None
+
+    # --- flushing ---------------------------------------------------------
+
+    async def flush(self) -> int:
+        """Write one batch of pending reports; returns how many were persisted."""
+        from .db import db
+
+        s = get_settings()
+        batch = list(self._pending.values())[: s.PERSIST_BATCH_SIZE]
+        if not batch:
+            await self._reap_tombstones()
+            return 0
+        versions = {r["id"]: self._versions.get(r["id"]) for r in batch}
+
+        self._writing = set(versions)
+        try:
+            for attempt in range(s.PERSIST_MAX_RETRIES + 1):
+                try:
+                    await asyncio.to_thread(db.upsert_reports, batch)
+                    break
+                except Exception as e:
+                    logger.warning(f"Report flush failed (attempt {attempt + 1}): {e}")
+                    metrics.inc("persist_flush_failures_total", doc="Failed batch writes")
+                    if attempt == s.PERSIST_MAX_RETRIES:
+                        await self._spill()
+                        return 0
+                    await asyncio.sleep(random.uniform(0, min(30.0, 0.5 * 2 ** attempt)))
+        finally:
+            self._writing = set()
+            await self._reap_tombstones()
+
+        for rid, version in versions.items():
+            # Changed while we were writing: keep it for the next flush
+            if self._versions.get(rid) == version:
+                self._pending.pop(rid, None)
+                self._versions.pop(rid, None)
+        metrics.inc("persist_flushed_total", len(batch), doc="Reports written to the database")
+        metrics.set_gauge("persist_pending", len(self._pending), doc="Reports waiting to be written")
+        await self._spill()
+        return len(batch)
+
+    async def _reap_tombstones(self) -> None:
+        """Delete rows that a finished upsert wrote after they were discarded."""
+        if not self._tombstones:
+            return
+        from .db import db
+
+        for rid in list(self._tombstones - self._writing):
+            try:
+                await db.delete_report(rid)
+                self._tombstones.discard(rid)
+            except Exception as e:
+                # Kept; the next flush tries again
+                logger.warning(f"Failed to delete discarded report {rid}: {e}")
+
+    async def _run(self) -> None:
+        s = get_settings()
+        await self._load_spill()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=s.PERSIST_FLUSH_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            # Let a burst of saves accumulate into one batch
+            await asyncio.sleep(s.PERSIST_FLUSH_DELAY_S)
+            while self._pending and await self.flush():
+                pass
+            await self._reap_tombstones()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and try to write everything; leftovers stay spilled."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self._pending and await self.flush():
+            pass
+        await self._spill()
+
+    # --- spill ------------------------------------------------------------
+
+    async def _spill(self) -> None:
+        """Mirror the buffer to Redis (REDIS_URL) or, best-effort, to PERSIST_SPILL_PATH."""
+        if get_settings().REDIS_URL:
+            await self._spill_redis()
+        else:
+            self._spill_file()
+
+    async def _load_spill(self) -> None:
+        if get_settings().REDIS_URL:
+            rows = await self._load_redis()
+        else:
+            rows = self._load_file()
+        for row in rows:
+            self._pending.setdefault(row["id"], row)
+            self._versions.setdefault(row["id"], 1)
+        if rows:
+            logger.info(f"Recovered {len(rows)} unflushed reports from the spill")
+            self._wake.set()
+
+    def _redis_client(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis  # type: ignore
+
+            self._redis = aioredis.from_url(get_settings().REDIS_URL, decode_responses=True)
+        return self._redis
+
+    async def _spill_redis(self) -> None:
+        key = get_settings().PERSIST_SPILL_REDIS_KEY
+        gone = self._spilled - self._pending.keys()
+        try:
+            async with self._redis_client().pipeline(transaction=True) as pipe:
+                if gone:
+                    pipe.hdel(key, *gone)
+                if self._pending:
+                    pipe.hset(key, mapping={
+                        rid: json.dumps(row, ensure_ascii=False) for rid, row in self._pending.items()
+                    })
+                await pipe.execute()
+            self._spilled = set(self._pending)
+        except Exception as e:
+            logger.error(f"❌ Failed to spill pending reports to Redis: {e}")
+
+    async def _load_redis(self) -> List[Dict[str, Any]]:
+        try:
+            raw = await self._redis_client().hgetall(get_settings().PERSIST_SPILL_REDIS_KEY)
+        except Exception as e:
+            logger.error(f"❌ Failed to read the Redis spill: {e}")
+            return []
+        rows = [json.loads(v) for v in raw.values()]
+        # Adopted: removed from the hash once flushed, like our own
+        self._spilled |= {row["id"] for row in rows}
+        return rows
+
+    def _spill_file(self) -> None:
+        path = get_settings().PERSIST_SPILL_PATH
+        if not path:
+            return
+        try:
+            if not self._pending:
+                if os.path.exists(path):
+                    os.remove(path)
+                return
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for row in self._pending.values():
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"❌ Failed to spill pending reports to {path}: {e}")
+
+    def _load_file(self) -> List[Dict[str, Any]]:
+        path = get_settings().PERSIST_SPILL_PATH
+        if not path or not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+queue = WriteBehindQueue()
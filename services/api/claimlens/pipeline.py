@@ -1,12 +1,18 @@
 # services/api/claimlens/pipeline.py
 import asyncio, hashlib, json, time
+from collections import OrderedDict
 from .models import AnalyzeRequest, AnalyzeResponse, Video, Claim, Consensus
 from .deps import get_settings
 from .youtube import extract_video_id, video_meta, transcript_text
-from .openai_client import chat, OpenAIError
-from .prompts import CLAIM_EXTRACT_SYSTEM, VERIFY_SYSTEM, CONSENSUS_SYSTEM
+from .stt import transcribe_video, AudioTooLong
+from .deadline import within_deadline, without_deadline, remaining, DeadlineExceeded
+from .openai_client import chat, OpenAIError, track_usage, answered_model
+from .prompt_budget import snippet_block, truncate_tokens
+from .prompts import CLAIM_EXTRACT_SYSTEM, VERIFY_SYSTEM, CONSENSUS_SYSTEM, PROMPT_VERSION
+from datetime import datetime, timezone
 import logging
 from .search import bing_snippets, factcheck_claims  # keep as-is; it can return []
+from . import metrics
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -21,11 +27,11 @@ logger = logging.getLogger(__name__)
 async def extract_claims(transcript: str, max_claims: int) -> tuple[list[str], str | None]:
     # Keep braces out of f-strings; build with plain strings
     user = (
-        transcript[:12000]
+        truncate_tokens(transcript, get_settings().EXTRACT_TRANSCRIPT_TOKENS)
         + "\n\nReturn JSON: "
         + _json({"claims": [{"text": "..."}]})
     )
-    txt = await chat(CLAIM_EXTRACT_SYSTEM, user)
+    txt = await chat(CLAIM_EXTRACT_SYSTEM, user, stage="extract")
     try:
         data = json.loads(txt)
 
@@ -49,8 +55,8 @@ async def extract_claims(transcript: str, max_claims: int) -> tuple[list[str], s
         logger.warning("Failed to parse claims JSON: %s", e)
         return [], None
 
-async def verify_one(claim: str) -> dict:
-    logger.info(f"🔍 Verifying claim: {claim[:100]}{'...' if len(claim) > 100 else ''}")
+async def gather_snippets(claim: str) -> list[dict]:
+    """Web and fact-check snippets for a claim ([] when search is disabled)."""
     s = get_settings()
     
     # Log search initiation
@@ -71,30 +77,39 @@ async def verify_one(claim: str) -> dict:
     else:
         logger.warning("⚠️  Search is DISABLED in settings, no snippets will be used")
 
-    # Prepare snippets for the model
-    snippet_block = "\n".join(
-        f"{i+1}) {snip.get('snippet','')} ({snip.get('url','')})"
-        for i, snip in enumerate(snippets)
+    return snippets
+
+def verify_prompt(claim: str, snippets: list[dict], *, with_confidence: bool = False) -> str:
+    s = get_settings()
+    # Prepare snippets for the model: deduped, ranked and trimmed to the token budget
+    block = snippet_block(
+        claim, snippets, s.VERIFY_SNIPPET_TOKENS, s.VERIFY_SNIPPET_MAX_TOKENS
     ) or "(none)"
 
     # Build the user prompt
     user_prompt = (
         f'Claim: "{claim}"\n'
-        "Snippets:\n" + snippet_block + "\n"
+        "Snippets:\n" + block + "\n"
         "Return JSON: "
         + _json({
             "rating": "unverified|doubtful|mixed|reliable|solid",
             "rationale": "...",
             "sources": [{"title": "...", "url": "..."}],
+            **({"confidence": "0.0-1.0 (how sure you are of the rating)"} if with_confidence else {}),
         })
     )
-    
+    return user_prompt
+
+async def _verify_with(model: str, claim: str, snippets: list[dict], user_prompt: str) -> dict:
     logger.debug("📤 Sending to verification model...")
     logger.debug(f"📝 Prompt: {user_prompt[:300]}..." if len(user_prompt) > 300 else f"📝 Prompt: {user_prompt}")
 
     try:
         # Get the raw response from the model
-        txt = await chat(VERIFY_SYSTEM, user_prompt)
+        txt = await chat(
+            VERIFY_SYSTEM, user_prompt, model=model,
+            stage="verify", max_tokens=get_settings().VERIFY_MAX_TOKENS,
+        )
         logger.debug(f"📥 Raw response: {txt}")
 
         # Parse the response
@@ -141,25 +156,88 @@ async def verify_one(claim: str) -> dict:
             logger.warning("⚠️  Claim marked as 'unverified' despite having snippets")
             logger.debug(f"First snippet: {snippets[0].get('snippet', '')[:200]}...")
 
+        # Self-reported confidence (cascade stage only); clamp junk to 0
+        try:
+            confidence = min(1.0, max(0.0, float(data.get("confidence"))))
+        except (TypeError, ValueError):
+            confidence = 0.0
+
         result = {
             "rating": rating,
             "rationale": rationale,
-            "sources": sources
+            "sources": sources,
+            "confidence": confidence,
+            "model": model,
         }
         
         logger.info(f"✅ Verification complete. Final rating: {rating}")
         return result
 
     except Exception as e:
-        logger.error(f"❌ Error in verify_one: {str(e)}", exc_info=True)
+        logger.error(f"❌ Error verifying with {model}: {str(e)}", exc_info=True)
         return {
             "rating": "unverified",
             "rationale": f"Verification error: {str(e)[:100]}",
             "sources": []
         }
 
+async def verify_with_snippets(claim: str, snippets: list[dict], *, cascade: bool | None = None) -> dict:
+    """
+    Rate a claim against the given snippets. In cascade mode a cheap model
+    answers first and only low-confidence or disputed ratings are escalated
+    to MODEL_PRIMARY.
+    """
+    s = get_settings()
+    cascade = s.CASCADE_ENABLED if cascade is None else cascade
+    if not cascade:
+        return await _verify_with(s.MODEL_PRIMARY, claim, snippets, verify_prompt(claim, snippets))
+
+    cheap = await _verify_with(
+        s.MODEL_CASCADE, claim, snippets, verify_prompt(claim, snippets, with_confidence=True)
+    )
+    confidence = cheap.get("confidence", 0.0)  # error results carry none
+    escalate = (
+        confidence < s.CASCADE_MIN_CONFIDENCE
+        or cheap["rating"] in s.CASCADE_ESCALATE_RATINGS
+    )
+    metrics.inc(
+        "verify_cascade_total", doc="Cascade verifications by cheap-model rating and escalation",
+        rating=cheap["rating"], escalated=str(escalate).lower(),
+    )
+    escalated = metrics.value("verify_cascade_total", rating=cheap["rating"], escalated="true")
+    kept = metrics.value("verify_cascade_total", rating=cheap["rating"], escalated="false")
+    logger.info(
+        f"🪜 Cascade: {s.MODEL_CASCADE} rated '{cheap['rating']}' at {confidence:.2f} → "
+        f"{'escalating' if escalate else 'accepted'} "
+        f"(escalation rate for '{cheap['rating']}': {escalated / (escalated + kept):.0%})"
+    )
+    if not escalate:
+        return cheap
+    return await _verify_with(s.MODEL_PRIMARY, claim, snippets, verify_prompt(claim, snippets))
+
+async def verify_one(claim: str) -> dict:
+    logger.info(f"🔍 Verifying claim: {claim[:100]}{'...' if len(claim) > 100 else ''}")
+    snippets = await gather_snippets(claim)
+    record_verification_input(claim, snippets)
+    return await verify_with_snippets(claim, snippets)
+
+def record_verification_input(claim: str, snippets: list[dict]) -> None:
+    """Append the claim and its snippets to VERIFY_RECORD_PATH for offline replay."""
+    path = get_settings().VERIFY_RECORD_PATH
+    if not path:
+        return
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(_json({"claim": claim, "snippets": snippets}) + "\n")
+    except OSError as e:
+        logger.warning(f"Failed to record verification input: {e}")
+
 async def consensus_from(verified: list[dict]) -> dict:
-    compact = [{"rating": v.get("rating"), "rationale": v.get("rationale", "")} for v in verified]
+    s = get_settings()
+    compact = [
+        {"rating": v.get("rating"), "rationale": truncate_tokens(v.get("rationale", ""), s.CONSENSUS_RATIONALE_TOKENS)}
+        for v in verified
+    ]
     
     # Update the expected output format in the prompt
     user = "Claims: " + _json(compact) + "\nReturn JSON: " + _json({
@@ -167,7 +245,7 @@ async def consensus_from(verified: list[dict]) -> dict:
         "summary": "..."
     })
     
-    txt = await chat(CONSENSUS_SYSTEM, user)
+    txt = await chat(CONSENSUS_SYSTEM, user, stage="consensus", max_tokens=s.CONSENSUS_MAX_TOKENS)
     
     try:
         data = json.loads(txt)
@@ -185,6 +263,79 @@ async def consensus_from(verified: list[dict]) -> dict:
         logger.warning(f"Failed to parse consensus: {e}")
         return {"rating": "unverified", "summary": "Unable to determine consensus due to an error."}
 
+class TranscriptPending(Exception):
+    """Speech-to-text is still running in the background; retry the request later."""
+    def __init__(self, video_id: str, retry_after_s: int) -> None:
+        super().__init__(f"Transcribing audio for {video_id}; retry in {retry_after_s}s")
+        self.retry_after_s = retry_after_s
+
+# video_id -> background transcription; finished ones are kept for the retry
+_stt_jobs: "OrderedDict[str, asyncio.Task]" = OrderedDict()
+_STT_JOBS_KEPT = 32
+
+def _stt_job(video_id: str, locale: str) -> asyncio.Task:
+    """Start (or join) transcription outside any request deadline, so a 504 doesn't waste it."""
+    task = _stt_jobs.get(video_id)
+    if task is None or (task.done() and (task.cancelled() or task.exception())):
+        task = asyncio.create_task(transcribe_video(video_id, locale), context=without_deadline())
+        _stt_jobs[video_id] = task
+        for vid in [v for v, t in _stt_jobs.items() if t.done()][: max(0, len(_stt_jobs) - _STT_JOBS_KEPT)]:
+            del _stt_jobs[vid]
+    return task
+
+async def transcript_with_fallback(video_id: str, locale: str = "en") -> str:
+    """
+    Caption transcript, else local speech-to-text when STT_ENABLED (only for
+    videos without captions: CaptionFetchError propagates). Under a
+    request deadline, transcription only gets what's left after reserving
+    STT_PIPELINE_RESERVE_S for extraction and verification; if it isn't done
+    by then, TranscriptPending is raised and the job keeps running.
+    """
+    s = get_settings()
+    tr = await within_deadline(transcript_text(video_id))
+    if tr:
+        return tr
+    if not s.STT_ENABLED:
+        # Clear 400 with actionable message
+        raise ValueError("Transcript unavailable; speech-to-text fallback is disabled (STT_ENABLED)")
+    task = _stt_job(video_id, locale)
+    left = remaining()
+    if left is not None:
+        budget = left - s.STT_PIPELINE_RESERVE_S
+        if budget > 0:
+            await asyncio.wait({task}, timeout=budget)
+        if not task.done():
+            raise TranscriptPending(video_id, s.STT_RETRY_AFTER_S)
+    try:
+        segments = await asyncio.shield(task)
+    except AudioTooLong:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Speech-to-text fallback failed for {video_id}: {e}", exc_info=True)
+        segments = []
+    tr = " ".join(seg["text"] for seg in segments)
+    if not tr:
+        raise ValueError("Transcript unavailable; speech-to-text found no speech")
+    return tr
+
+def timed_out_claim(text: str) -> dict:
+    """Placeholder for a claim whose verification missed the request deadline."""
+    return claim_record(text, {
+        "rating": "unverified",
+        "rationale": "Verification timed out; this claim will be updated shortly.",
+        "sources": [],
+    })
+
+def claim_record(text: str, v: dict) -> dict:
+    """Shape a verify_one() result into the Claim payload for `text`."""
+    return {
+        "id": hashlib.sha256(text.encode()).hexdigest(),
+        "text": text,
+        "rating": v["rating"],
+        "rationale": v.get("rationale", "")[:180],
+        "sources": v.get("sources", []),
+    }
+
 async def run_pipeline(req: AnalyzeRequest) -> AnalyzeResponse:
     s = get_settings()
     t0 = time.time()
@@ -192,39 +343,64 @@ async def run_pipeline(req: AnalyzeRequest) -> AnalyzeResponse:
     vid = extract_video_id(str(req.url))
     if not vid:
         raise ValueError("Invalid YouTube URL")
+    usage = track_usage()
 
-    meta = await video_meta(vid)
-    tr = await transcript_text(vid)
-    if not tr:
-        # Clear 400 with actionable message
-        raise ValueError("Transcript unavailable; Whisper fallback not yet configured")
+    # Stages before verification have nothing partial to return: they either
+    # finish inside the budget or the request fails with DeadlineExceeded
+    meta = await within_deadline(video_meta(vid))
+    # Captions are bounded by the deadline; slow STT runs on in the background
+    tr = await transcript_with_fallback(vid, req.locale)
 
-    claims_text, video_summary = await extract_claims(tr, min(req.maxClaims, s.MAX_CLAIMS))
+    claims_text, video_summary = await within_deadline(
+        extract_claims(tr, min(req.maxClaims, s.MAX_CLAIMS))
+    )
     # verify in parallel (cap 3)
     sem = asyncio.Semaphore(3)
 
     async def _verify(c: str):
         async with sem:
             v = await verify_one(c)
-            return {
-                "id": hashlib.sha256(c.encode()).hexdigest(),
-                "text": c,
-                "rating": v["rating"],
-                "rationale": v.get("rationale", "")[:180],
-                "sources": v.get("sources", []),
-            }
+            return claim_record(c, v)
+
+    # Verifications run outside the deadline so late ones can finish in the background
+    ctx = without_deadline()
+    tasks = [asyncio.create_task(_verify(c), context=ctx) for c in claims_text]
+    left = remaining()
+    if tasks:
+        wait_s = None if left is None else max(0.0, left - s.DEADLINE_CONSENSUS_RESERVE_S)
+        await asyncio.wait(tasks, timeout=wait_s)
+    verified = [
+        t.result() if t.done() else timed_out_claim(c)
+        for c, t in zip(claims_text, tasks)
+    ]
+    late = [t for t in tasks if not t.done()]
+
+    try:
+        cons = await within_deadline(consensus_from(verified))
+    except DeadlineExceeded:
+        cons = {"rating": "unverified", "summary": "Timed out before a consensus could be formed."}
 
-    verified = await asyncio.gather(*[_verify(c) for c in claims_text])
-    cons = await consensus_from(verified)
+    meta_out = {
+        "tookMs": int((time.time() - t0) * 1000),
+        "model": answered_model(usage),
+        "promptVersion": PROMPT_VERSION,
+        "analyzedAt": datetime.now(timezone.utc).isoformat(),
+        "cached": False,
+        "tokens": usage,
+    }
+    if late:
+        meta_out["partial"] = True
+        meta_out["pendingClaims"] = len(late)
+        logger.warning(f"⏱️  Deadline hit: returning {len(tasks) - len(late)}/{len(tasks)} verified claims")
 
-    return AnalyzeResponse(
+    result = AnalyzeResponse(
         video=Video(**meta),
         consensus=Consensus(**cons),
         claims=[Claim(**v) for v in verified],
-        meta={
-            "tookMs": int((time.time() - t0) * 1000),
-            "model": s.MODEL_PRIMARY,
-            "cached": False,
-        },
+        meta=meta_out,
         videoSummary=video_summary or "",
     )
+    if late:
+        # Picked up by freshness.schedule_late_claims() once the report is saved
+        result._late = tasks
+    return result
@@ -0,0 +1,167 @@
+# services/api/claimlens/profiling.py
+"""
+On-demand profiling of a single request.
+
+Enabled only when CLAIMLENS_DEBUG is set AND the request carries
+`X-Claimlens-Profile: file|inline` plus a matching `X-Admin-Token`; every
+other request pays one header lookup. A profiled request gets:
+
+- a sampling profile of its coroutines (pyinstrument, async-aware), written
+  as speedscope JSON, which flamegraph viewers open directly;
+- event-loop blocking episodes longer than PROFILE_BLOCK_THRESHOLD_MS, with
+  the loop thread's stack at the time (e.g. sync Supabase calls);
+- the top tracemalloc allocation sites by bytes allocated during the request
+  (a snapshot diff, so with overlapping profiled requests it includes theirs).
+
+"file" writes <PROFILE_DIR>/<id>.speedscope.json and <id>.report.json and
+returns the normal response with an X-Claimlens-Profile-Id header; "inline"
+returns the profile as the JSON response body instead.
+
+Needs the optional `profiling` extra (pyinstrument).
+"""
+import asyncio, json, logging, os, sys, threading, time, traceback, tracemalloc, uuid
+from typing import List, Optional
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from .deps import get_settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-claimlens-profile"
+
+class LoopBlockMonitor:
+    """
+    Watchdog thread that notices when the event loop stops running callbacks.
+    A heartbeat task stamps the time; if the stamp goes stale for longer than
+    the threshold, the loop thread's current stack is captured.
+    """
+    def __init__(self, threshold_s: float) -> None:
+        self.threshold_s = threshold_s
+        self.episodes: List[dict] = []
+        self._last = time.monotonic()
+        self._stop = threading.Event()
+        self._beat_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id = threading.get_ident()
+
+    async def _beat(self) -> None:
+        interval = self.threshold_s / 4
+        while True:
+            self._last = time.monotonic()
+            await asyncio.sleep(interval)
+
+    def _watch(self) -> None:
+        interval = self.threshold_s / 4
+        current: Optional[dict] = None
+        while not self._stop.wait(interval):
+            last = self._last
+            if time.monotonic() - last > self.threshold_s + interval:
+                if current is None:
+                    frame = sys._current_frames().get(self._loop_thread_id)
+                    current = {"since": last, "stack": traceback.format_stack(frame) if frame else []}
+            elif current is not None:
+                # Heartbeat resumed: the loop was stuck between the two stamps
+                since = current.pop("since")
+                current["durationMs"] = round(max(0.0, last - since - interval) * 1000, 1)
+                self.episodes.append(current)
+                current = None
+        if current is not None:
+            since = current.pop("since")
+            current["durationMs"] = round((time.monotonic() - since) * 1000, 1)
+            current["ongoing"] = True
+            self.episodes.append(current)
+
+    def start(self) -> None:
+        self._beat_task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-block-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> List[dict]:
+        self._stop.set()
+        if self._beat_task is not None:
+            self._beat_task.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        return self.episodes
+
+def _authorized(request: Request) -> bool:
+    s = get_settings()
+    return bool(s.CLAIMLENS_DEBUG and s.ADMIN_TOKEN and request.headers.get("x-admin-token") == s.ADMIN_TOKEN)
+
+# tracemalloc is process-global: started by the first profiled request and
+# stopped only when the last one finishes (never if something else started it)
+_tracing_refs = 0
+_tracing_owned = False
+
+def _start_tracing(frames: int) -> None:
+    global _tracing_refs, _tracing_owned
+    if _tracing_refs == 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        _tracing_owned = True
+    _tracing_refs += 1
+
+def _stop_tracing() -> None:
+    global _tracing_refs, _tracing_owned
+    _tracing_refs -= 1
+    if _tracing_refs == 0 and _tracing_owned:
+        tracemalloc.stop()
+        _tracing_owned = False
+
+def _top_allocations(snapshot: "tracemalloc.Snapshot", baseline: "tracemalloc.Snapshot", limit: int) -> List[dict]:
+    stats = [d for d in snapshot.compare_to(baseline, "lineno") if d.size_diff > 0]
+    return [
+        {"site": str(stat.traceback[0]), "sizeKiB": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+        for stat in stats[:limit]
+    ]
+
+async def profiling_middleware(request: Request, call_next):
+    mode = request.headers.get(PROFILE_HEADER)
+    if mode not in ("file", "inline") or not _authorized(request):
+        return await call_next(request)
+
+    from pyinstrument import Profiler  # type: ignore
+    from pyinstrument.renderers import SpeedscopeRenderer  # type: ignore
+
+    s = get_settings()
+    profile_id = uuid.uuid4().hex[:12]
+    _start_tracing(s.PROFILE_TRACEMALLOC_FRAMES)
+    baseline = tracemalloc.take_snapshot()
+    monitor = LoopBlockMonitor(s.PROFILE_BLOCK_THRESHOLD_MS / 1000)
+    profiler = Profiler(interval=s.PROFILE_INTERVAL_S, async_mode="enabled")
+
+    t0 = time.perf_counter()
+    monitor.start()
+    profiler.start()
+    try:
+        response = await call_next(request)
+        # Drain the body so streaming work is inside the profile too
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    finally:
+        profiler.stop()
+        episodes = monitor.stop()
+        snapshot = tracemalloc.take_snapshot()
+        _stop_tracing()
+
+    report = {
+        "id": profile_id,
+        "path": request.url.path,
+        "status": response.status_code,
+        "wallMs": round((time.perf_counter() - t0) * 1000, 1),
+        "blockingEpisodes": episodes,
+        "allocations": _top_allocations(snapshot, baseline, s.PROFILE_TOP_ALLOCS),
+    }
+    speedscope = profiler.output(SpeedscopeRenderer())
+    logger.info(f"🧪 Profiled {request.url.path}: {report['wallMs']} ms, {len(episodes)} loop blocks")
+
+    if mode == "inline":
+        return JSONResponse({**report, "speedscope": json.loads(speedscope)})
+
+    os.makedirs(s.PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(s.PROFILE_DIR, f"{profile_id}.speedscope.json"), "w", encoding="utf-8") as f:
+        f.write(speedscope)
+    with open(os.path.join(s.PROFILE_DIR, f"{profile_id}.report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    headers["X-Claimlens-Profile-Id"] = profile_id
+    return Response(content=body, status_code=response.status_code, headers=headers)
@@ -0,0 +1,149 @@
+# services/api/claimlens/prompt_budget.py
+"""
+Token-budgeted prompt assembly.
+
+Snippets from Bing/FactCheck are cleaned (tracking parameters stripped),
+deduplicated, ranked by relevance to the claim and by domain authority, and
+packed into a per-call token budget counted with tiktoken.
+
+tiktoken downloads its BPE files on first use unless they are already in
+TIKTOKEN_CACHE_DIR (the Docker image bakes them in). If loading fails, token
+counts fall back to a ~4 characters per token estimate, and the load is
+retried at most every _ENCODER_RETRY_S, so a missing file never fails or
+blocks every request.
+"""
+import logging, math, re, time
+from typing import List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import tiktoken
+from .deps import get_settings
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_TRACKING = re.compile(r"^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|igshid|ref|ref_src|spm|_hs\w+)$", re.I)
+
+# Rough source authority in [0, 1]; unknown domains get _DEFAULT_AUTHORITY
+_AUTHORITY = {
+    "who.int": 1.0, "nih.gov": 1.0, "cdc.gov": 1.0, "nasa.gov": 1.0, "esa.int": 1.0,
+    "nature.com": 0.95, "science.org": 0.95, "thelancet.com": 0.95, "nejm.org": 0.95,
+    "bmj.com": 0.95, "cochranelibrary.com": 0.95, "jamanetwork.com": 0.95,
+    "britannica.com": 0.8, "reuters.com": 0.75, "apnews.com": 0.75,
+    "snopes.com": 0.75, "politifact.com": 0.75, "factcheck.org": 0.75, "fullfact.org": 0.75,
+    "wikipedia.org": 0.6,
+}
+_TLD_AUTHORITY = {"gov": 0.9, "edu": 0.85, "int": 0.8, "mil": 0.8}
+_DEFAULT_AUTHORITY = 0.3
+
+_CHARS_PER_TOKEN = 4  # estimate used while no tiktoken encoding is available
+_ENCODER_RETRY_S = 300
+_encoders: dict[str, "tiktoken.Encoding"] = {}
+_encoder_failed_at: Optional[float] = None
+
+def _encoder(model: str) -> Optional["tiktoken.Encoding"]:
+    """The tiktoken encoding for `model`, or None while it can't be loaded."""
+    global _encoder_failed_at
+    enc = _encoders.get(model)
+    if enc is not None:
+        return enc
+    if _encoder_failed_at is not None and time.monotonic() - _encoder_failed_at < _ENCODER_RETRY_S:
+        return None
+    try:
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # Typically no network and nothing in TIKTOKEN_CACHE_DIR
+        _encoder_failed_at = time.monotonic()
+        logger.warning(f"⚠️ tiktoken encoding for {model} unavailable, estimating tokens from length: {e}")
+        return None
+    _encoders[model] = enc
+    return enc
+
+def warm_encoder(model: str | None = None) -> bool:
+    """Load the encoding ahead of the first request (call from a thread); False if it isn't available."""
+    return _encoder(model or get_settings().MODEL_PRIMARY) is not None
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    enc = _encoder(model or get_settings().MODEL_PRIMARY)
+    if enc is None:
+        return math.ceil(len(text or "") / _CHARS_PER_TOKEN)
+    return len(enc.encode(text or ""))
+
+def truncate_tokens(text: str, max_tokens: int, model: str | None = None) -> str:
+    enc = _encoder(model or get_settings().MODEL_PRIMARY)
+    if enc is None:
+        max_chars = max_tokens * _CHARS_PER_TOKEN
+        if len(text or "") <= max_chars:
+            return text
+        return text[: max(0, max_chars - 1)].rstrip() + "…"
+    ids = enc.encode(text or "")
+    if len(ids) <= max_tokens:
+        return text
+    return enc.decode(ids[: max(0, max_tokens - 1)]).rstrip() + "…"
+
+def clean_url(url: str | None) -> str:
+    """Drop tracking query parameters and fragments."""
+    if not url:
+        return ""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _TRACKING.match(k)])
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+def authority(url: str | None) -> float:
+    host = (urlsplit(url or "").hostname or "").lower()
+    labels = host.split(".")
+    for i in range(len(labels) - 1):
+        score = _AUTHORITY.get(".".join(labels[i:]))
+        if score is not None:
+            return score
+    return _TLD_AUTHORITY.get(labels[-1], _DEFAULT_AUTHORITY) if host else 0.0
+
+def _tokens(text: str) -> frozenset[str]:
+    return frozenset(_WORD.findall((text or "").lower()))
+
+def dedupe_snippets(snippets: List[dict], threshold: float = 0.8) -> List[dict]:
+    """Drop snippets with a repeated URL or near-identical text (token Jaccard)."""
+    kept: List[dict] = []
+    seen_urls: set[str] = set()
+    seen_tokens: List[frozenset[str]] = []
+    for snip in snippets:
+        url = clean_url(snip.get("url"))
+        toks = _tokens(snip.get("snippet") or snip.get("title") or "")
+        if url and url in seen_urls:
+            continue
+        if toks and any(len(toks & t) / len(toks | t) >= threshold for t in seen_tokens):
+            continue
+        seen_urls.add(url)
+        seen_tokens.append(toks)
+        kept.append({**snip, "url": url})
+    return kept
+
+def rank_snippets(claim: str, snippets: List[dict]) -> List[dict]:
+    """Order by claim-term coverage (70%) and domain authority (30%)."""
+    claim_toks = _tokens(claim)
+
+    def score(snip: dict) -> float:
+        toks = _tokens((snip.get("title") or "") + " " + (snip.get("snippet") or ""))
+        relevance = len(claim_toks & toks) / len(claim_toks) if claim_toks else 0.0
+        return 0.7 * relevance + 0.3 * authority(snip.get("url"))
+
+    return sorted(snippets, key=score, reverse=True)
+
+def snippet_block(claim: str, snippets: List[dict], budget_tokens: int, per_snippet_tokens: int) -> str:
+    """Numbered snippet lines, best first, that fit in `budget_tokens`."""
+    lines: List[str] = []
+    used = 0
+    for snip in rank_snippets(claim, dedupe_snippets(snippets)):
+        text = truncate_tokens(snip.get("snippet") or "", per_snippet_tokens)
+        line = f"{len(lines) + 1}) {text} ({snip.get('url', '')})"
+        cost = count_tokens(line) + 1  # newline
+        if used + cost > budget_tokens:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
@@ -1,3 +1,5 @@
+import hashlib
+
 CLAIM_EXTRACT_SYSTEM = (
     "You are a YouTube transcript analyzer. In ONE PASS:\n"
     "1) Infer the video’s overall intent: advise, warn, debunk, endorse, inform, or none.\n"
@@ -73,4 +75,9 @@ VERIFY_SYSTEM = (
 
 CONSENSUS_SYSTEM = (
     "You summarize consensus across all rated claims. Be conservative if claims conflict. Output rating and 2–3 sentence summary."
-)
\ No newline at end of file
+)
+# Changes whenever any prompt text changes; stored in report meta so outdated
+# reports can be detected and re-analyzed.
+PROMPT_VERSION = hashlib.sha256(
+    (CLAIM_EXTRACT_SYSTEM + VERIFY_SYSTEM + CONSENSUS_SYSTEM).encode("utf-8")
+).hexdigest()[:12]
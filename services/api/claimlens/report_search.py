@@ -0,0 +1,242 @@
+# services/api/claimlens/report_search.py
+"""
+Full-text search over saved reports (video title, channel, summary, claims).
+
+Two backends behind one call, picked by SEARCH_BACKEND:
+- "postgres": the `search_reports` SQL function (tsvector + trigram indexes,
+  see infra/supabase_schema.sql), called through Supabase RPC.
+- "memory": an incrementally maintained in-process inverted index with BM25
+  ranking, for the mock setup. Kept current by index_report()/unindex_report().
+
+Results are ordered by (score desc, id desc) and paginated with an opaque
+keyset cursor encoding the last (score, id) pair.
+"""
+import base64, heapq, json, logging, math, re
+from typing import Iterable, List, Optional, Tuple
+from .deps import get_settings
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+# Field weights: a hit in the title counts more than one in a claim
+_FIELDS = (("title", 3.0), ("channel", 2.0), ("summary", 1.0), ("claims", 1.0))
+_K1, _B = 1.2, 0.75
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _WORD.findall((text or "").lower()) if t not in _STOP]
+
+def round_score(score: float) -> float:
+    """Scores are kept to 9 significant digits so they survive the cursor round trip."""
+    return float(f"{score:.9g}")
+
+def encode_cursor(score: float, report_id: str) -> str:
+    raw = json.dumps([round_score(score), report_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        score, report_id = json.loads(base64.urlsafe_b64decode(cursor + pad))
+        return float(score), str(report_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _fields(data: dict) -> Iterable[Tuple[str, str]]:
+    video = data.get("video") or {}
+    yield "title", video.get("title") or ""
+    yield "channel", video.get("channel") or ""
+    yield "summary", " ".join([data.get("videoSummary") or "", (data.get("consensus") or {}).get("summary") or ""])
+    yield "claims", " ".join(c.get("text") or "" for c in data.get("claims") or [])
+
+def matching_claims(data: dict, q: str, rating: Optional[str] = None) -> List[dict]:
+    """Claims of a report that contain any query term (and have `rating`, if given)."""
+    terms = set(tokenize(q))
+    out = []
+    for c in data.get("claims") or []:
+        if rating and c.get("rating") != rating:
+            continue
+        if terms & set(tokenize(c.get("text") or "")):
+            out.append(c)
+    return out
+
+def _length_class(length: float) -> int:
+    """Quarter-octave bucket of a document length; 2 ** (class / 4) <= length."""
+    return int(4 * math.log2(max(length, 1.0)))
+
+class InvertedIndex:
+    """
+    BM25 over weighted fields. Each term's postings are grouped into tiers
+    keyed by (term weight, length class), so search() can bound what any
+    report in a tier could score and stop once no remaining tier can enter
+    the top k (impact-ordered early termination).
+    """
+    def __init__(self) -> None:
+        self._tiers: dict[str, dict[Tuple[float, int], set[str]]] = {}
+        self._df: dict[str, int] = {}
+        self._tf: dict[str, dict[str, float]] = {}
+        self._doc_len: dict[str, float] = {}
+        self._ratings: dict[str, frozenset[str]] = {}
+        self._docs: dict[str, dict] = {}
+        self._total_len = 0.0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, report_id: str, data: dict, created_at: Optional[str] = None) -> None:
+        """Index (or re-index) one report."""
+        self.remove(report_id)
+        tf: dict[str, float] = {}
+        fields = dict(_fields(data))
+        for name, weight in _FIELDS:
+            for tok in tokenize(fields[name]):
+                tf[tok] = tf.get(tok, 0.0) + weight
+        length = sum(tf.values())
+        lc = _length_class(length)
+        for tok, w in tf.items():
+            self._tiers.setdefault(tok, {}).setdefault((w, lc), set()).add(report_id)
+            self._df[tok] = self._df.get(tok, 0) + 1
+        self._doc_len[report_id] = length
+        self._total_len += length
+        self._tf[report_id] = tf
+        self._ratings[report_id] = frozenset(c.get("rating") for c in data.get("claims") or [])
+        self._docs[report_id] = {"id": report_id, "data": data, "created_at": created_at}
+
+    def remove(self, report_id: str) -> None:
+        tf = self._tf.pop(report_id, {})
+        length = self._doc_len.pop(report_id, 0.0)
+        lc = _length_class(length)
+        for tok, w in tf.items():
+            tiers = self._tiers[tok]
+            tier = tiers[(w, lc)]
+            tier.discard(report_id)
+            if not tier:
+                del tiers[(w, lc)]
+            self._df[tok] -= 1
+            if not self._df[tok]:
+                del self._df[tok], self._tiers[tok]
+        self._total_len -= length
+        self._ratings.pop(report_id, None)
+        self._docs.pop(report_id, None)
+
+    def search(
+        self, q: str, *, rating: Optional[str] = None, limit: int = 10,
+        after: Optional[Tuple[float, str]] = None,
+    ) -> List[Tuple[float, dict]]:
+        """All query terms must match (AND); ranked by BM25 over weighted fields."""
+        terms = list(dict.fromkeys(tokenize(q)))
+        if not terms or not self._docs or limit <= 0:
+            return []
+        if any(t not in self._df for t in terms):
+            return []
+        n = len(self._docs)
+        avg = self._total_len / n
+        idf = {t: math.log(1 + (n - self._df[t] + 0.5) / (self._df[t] + 0.5)) for t in terms}
+
+        def bound(term: str, tier: Tuple[float, int]) -> float:
+            # Highest score `term` gives any report in `tier`: its weight at the class's shortest length
+            w, lc = tier
+            return idf[term] * w * (_K1 + 1) / (w + _K1 * (1 - _B + _B * 2 ** (lc / 4) / avg))
+
+        # Walk the rarest term's tiers, best bound first. The other terms are looked
+        # up per report; in a given length class each adds at most its heaviest weight
+        terms.sort(key=self._df.__getitem__)
+        driver = terms[0]
+        heaviest: List[dict[int, float]] = []
+        for t in terms[1:]:
+            by_class: dict[int, float] = {}
+            for w, lc in self._tiers[t]:
+                if w > by_class.get(lc, 0.0):
+                    by_class[lc] = w
+            heaviest.append(by_class)
+        tiers = []
+        for tier in self._tiers[driver]:
+            lc = tier[1]
+            if all(lc in by_class for by_class in heaviest):
+                ub = bound(driver, tier) + sum(bound(t, (h[lc], lc)) for t, h in zip(terms[1:], heaviest))
+                tiers.append((ub, tier))
+        tiers.sort(reverse=True)
+
+        top: List[Tuple[float, str]] = []  # min-heap of the best (score, id) so far
+        for ub, tier in tiers:
+            # Ties break on id, so stop only once nothing left can even equal the k-th score
+            if len(top) >= limit and ub * (1 + 1e-8) < top[0][0]:
+                break
+            for doc in self._tiers[driver][tier]:
+                if rating and rating not in self._ratings[doc]:
+                    continue
+                tf = self._tf[doc]
+                norm = _K1 * (1 - _B + _B * self._doc_len[doc] / avg)
+                score = 0.0
+                for t in terms:
+                    w = tf.get(t)
+                    if w is None:
+                        break
+                    score += idf[t] * w * (_K1 + 1) / (w + norm)
+                else:
+                    item = (round_score(score), doc)
+                    if after is not None and item >= after:
+                        continue
+                    if len(top) < limit:
+                        heapq.heappush(top, item)
+                    elif item > top[0]:
+                        heapq.heapreplace(top, item)
+        top.sort(reverse=True)
+        return [(score, self._docs[doc]) for score, doc in top]
+
+_index: Optional[InvertedIndex] = None
+
+def get_index() -> InvertedIndex:
+    global _index
+    if _index is None:
+        _index = InvertedIndex()
+    return _index
+
+def _memory_backend() -> bool:
+    return get_settings().SEARCH_BACKEND == "memory"
+
+def index_report(report_id: str, data: dict, created_at: Optional[str] = None) -> None:
+    """Keep the in-process index current after a report is saved or refreshed."""
+    if _memory_backend() and report_id:
+        get_index().add(report_id, data, created_at)
+
+def unindex_report(report_id: str) -> None:
+    if _memory_backend():
+        get_index().remove(report_id)
+
+async def warm_index(page_size: int = 200) -> int:
+    """Load every saved report into the in-process index (startup)."""
+    from .db import db
+
+    idx = get_index()
+    offset = 0
+    while True:
+        page = await db.get_saved_reports(limit=page_size, offset=offset)
+        for row in page["reports"]:
+            if row.get("data"):
+                idx.add(row["id"], row["data"], row.get("created_at"))
+        if not page["has_more"]:
+            break
+        offset += page_size
+    logger.info(f"Search index warmed with {len(idx)} reports")
+    return len(idx)
+
+async def search_reports(
+    q: str, *, rating: Optional[str] = None, limit: int = 10, cursor: Optional[str] = None,
+) -> Tuple[List[Tuple[float, dict]], Optional[str]]:
+    """Ranked (score, row) pairs plus the cursor for the next page (None if last)."""
+    after = decode_cursor(cursor) if cursor else None
+    if _memory_backend():
+        hits = get_index().search(q, rating=rating, limit=limit + 1, after=after)
+    else:
+        from .db import db
+        rows = await db.search_reports(q, rating=rating, limit=limit + 1, after=after)
+        hits = [(float(r.get("rank") or 0.0), r) for r in rows]
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        score, row = hits[-1]
+        next_cursor = encode_cursor(score, str(row["id"]))
+    return hits, next_cursor
@@ -1,5 +1,9 @@
-import httpx, os
+import asyncio, os
 from typing import List, Dict
+from .httpclient import get_http
+from .deadline import timeout_for
+from .deps import get_settings
+from . import factcheck_index, metrics
 
 BING = os.getenv("BING_API_KEY", "")
 GFC = os.getenv("GOOGLE_FACTCHECK_API_KEY", "")
@@ -8,21 +12,26 @@ async def bing_snippets(query: str, n: int = 3) -> List[Dict]:
     if not BING:
         return []
     headers = {"Ocp-Apim-Subscription-Key": BING}
-    async with httpx.AsyncClient(timeout=15) as cx:
-        r = await cx.get("https://api.bing.microsoft.com/v7.0/search", params={"q": query, "count": n}, headers=headers)
-        r.raise_for_status()
-        web = r.json().get("webPages", {}).get("value", [])
-        return [{"title": w.get("name"), "snippet": w.get("snippet"), "url": w.get("url")} for w in web]
+    r = await get_http().get("https://api.bing.microsoft.com/v7.0/search", params={"q": query, "count": n}, headers=headers, timeout=timeout_for(15))
+    r.raise_for_status()
+    web = r.json().get("webPages", {}).get("value", [])
+    return [{"title": w.get("name"), "snippet": w.get("snippet"), "url": w.get("url")} for w in web]
 
 async def factcheck_claims(query: str, n: int = 2) -> List[Dict]:
-    if not GFC:
+    # mmap reads and scoring block; keep them off the event loop
+    local = await asyncio.to_thread(factcheck_index.lookup, query, n)
+    if local:
+        metrics.inc("factcheck_lookups_total", doc="Fact-check lookups by source", source="local")
+        return local
+    if not GFC or not get_settings().FACTCHECK_API_FALLBACK:
+        metrics.inc("factcheck_lookups_total", doc="Fact-check lookups by source", source="miss")
         return []
-    async with httpx.AsyncClient(timeout=15) as cx:
-        r = await cx.get("https://factchecktools.googleapis.com/v1alpha1/claims:search", params={"query": query, "key": GFC, "pageSize": n})
-        r.raise_for_status()
-        items = r.json().get("claims", [])
-        out = []
-        for it in items:
-            url = (it.get("claimReview") or [{}])[0].get("url")
-            out.append({"title": it.get("text", "Fact check"), "snippet": it.get("text", ""), "url": url})
-        return out
\ No newline at end of file
+    metrics.inc("factcheck_lookups_total", doc="Fact-check lookups by source", source="api")
+    r = await get_http().get("https://factchecktools.googleapis.com/v1alpha1/claims:search", params={"query": query, "key": GFC, "pageSize": n}, timeout=timeout_for(15))
+    r.raise_for_status()
+    items = r.json().get("claims", [])
+    out = []
+    for it in items:
+        url = (it.get("claimReview") or [{}])[0].get("url")
+        out.append({"title": it.get("text", "Fact check"), "snippet": it.get("text", ""), "url": url})
+    return out
\ No newline at end of file
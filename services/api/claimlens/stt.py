@@ -0,0 +1,226 @@
+# services/api/claimlens/stt.py
+"""
+Local speech-to-text fallback for videos without captions.
+
+Audio is fetched with yt-dlp (or read from STT_LOCAL_AUDIO_DIR), decoded to
+16 kHz mono PCM with ffmpeg, split on silence with a simple energy VAD and
+transcribed segment-by-segment across a process pool running a CPU-only
+faster-whisper model. Output segments have the same shape as the caption
+segments from youtube.transcript_segments(): {"text", "start", "duration"}.
+
+Videos longer than STT_MAX_AUDIO_S are refused before download (AudioTooLong),
+and decoding is capped at that length too, so memory stays bounded at
+STT_MAX_AUDIO_S * 64 KB (16 kHz float32).
+
+Needs the optional `stt` extra (faster-whisper, numpy) and ffmpeg on PATH.
+"""
+import asyncio, logging, multiprocessing, os, subprocess, tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+from .deps import get_settings
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+_READ_BYTES = 1 << 20  # ffmpeg stdout is converted in ~30 s pieces
+
+class AudioTooLong(ValueError):
+    """The video is longer than STT_MAX_AUDIO_S (or a live stream)."""
+
+def load_pcm(path: str | Path, max_s: float = 0):
+    """
+    Decode any audio/video file to float32 mono PCM at SAMPLE_RATE, keeping
+    at most `max_s` seconds (0 = all). The s16 stream is converted chunk by
+    chunk, so only the float32 result is ever held in full.
+    """
+    import numpy as np  # type: ignore
+
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", str(path)]
+    if max_s:
+        cmd += ["-t", str(max_s)]
+    cmd += ["-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"]
+    cap = int(max_s * SAMPLE_RATE) if max_s else 0
+    out = np.empty(cap, np.float32) if cap else None
+    parts, n, tail, err = [], 0, b"", b""
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            chunk = proc.stdout.read(_READ_BYTES)
+            if not chunk:
+                break
+            if tail:
+                chunk = tail + chunk
+            even = len(chunk) & ~1
+            tail = chunk[even:]
+            samples = np.frombuffer(chunk, np.int16, even // 2)
+            if out is not None:
+                take = min(len(samples), cap - n)
+                out[n:n + take] = samples[:take]
+            else:
+                take = len(samples)
+                parts.append(samples.astype(np.float32))
+            n += take
+        err = proc.stderr.read()
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
+        proc.wait()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=err)
+    pcm = out[:n] if out is not None else (np.concatenate(parts) if parts else np.empty(0, np.float32))
+    pcm *= 1 / 32768.0
+    return pcm
+
+def download_audio(video_id: str, dest_dir: str, max_s: float = 0) -> Path:
+    """
+    Download the best audio-only stream for `video_id` into `dest_dir`.
+    Raises AudioTooLong, before downloading anything, for live streams and
+    videos longer than `max_s` seconds (0 = no limit).
+    """
+    import yt_dlp  # type: ignore
+
+    opts = {
+        "format": "bestaudio/best",
+        "outtmpl": os.path.join(dest_dir, "%(id)s.%(ext)s"),
+        "quiet": True,
+        "noprogress": True,
+        "noplaylist": True,
+    }
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+        duration = info.get("duration") or 0
+        if info.get("is_live"):
+            raise AudioTooLong(f"Video {video_id} is a live stream; speech-to-text needs a finished video")
+        if max_s and duration > max_s:
+            raise AudioTooLong(
+                f"Video {video_id} is {duration / 60:.0f} min long; speech-to-text is limited to {max_s / 60:.0f} min"
+            )
+        info = ydl.process_ie_result(info, download=True)
+        return Path(ydl.prepare_filename(info))
+
+def _local_audio(video_id: str) -> Optional[Path]:
+    d = get_settings().STT_LOCAL_AUDIO_DIR
+    if not d:
+        return None
+    return next(iter(sorted(Path(d).glob(f"{video_id}.*"))), None)
+
+def video_pcm(video_id: str):
+    """PCM for a video (at most STT_MAX_AUDIO_S): local file if present, else a temporary yt-dlp download."""
+    max_s = get_settings().STT_MAX_AUDIO_S
+    local = _local_audio(video_id)
+    if local:
+        return load_pcm(local, max_s)
+    with tempfile.TemporaryDirectory(prefix="claimlens-stt-") as tmp:
+        return load_pcm(download_audio(video_id, tmp, max_s), max_s)
+
+def vad_segments(
+    pcm,
+    *,
+    frame_ms: int = 30,
+    min_silence_ms: int = 400,
+    max_segment_s: float = 30.0,
+    pad_ms: int = 150,
+) -> List[Tuple[int, int]]:
+    """
+    Energy-based voice activity detection. Returns (start, end) sample
+    offsets of voiced regions, split at pauses of at least `min_silence_ms`
+    and capped at `max_segment_s` (Whisper's 30 s window).
+    """
+    import numpy as np  # type: ignore
+
+    frame = SAMPLE_RATE * frame_ms // 1000
+    n = len(pcm) // frame
+    if n == 0:
+        return []
+    energy = np.sqrt((pcm[: n * frame].reshape(n, frame) ** 2).mean(axis=1))
+    # Adaptive threshold a few times above the noise floor
+    threshold = max(float(np.percentile(energy, 10)) * 3.0, 1e-3)
+    voiced = energy > threshold
+
+    min_silence = max(1, min_silence_ms // frame_ms)
+    max_frames = int(max_segment_s * 1000 // frame_ms)
+    spans: List[Tuple[int, int]] = []
+    start, silence = None, 0
+    for i, v in enumerate(voiced):
+        if v:
+            if start is None:
+                start = i
+            silence = 0
+        elif start is not None:
+            silence += 1
+            if silence >= min_silence:
+                spans.append((start, i - silence + 1))
+                start, silence = None, 0
+        if start is not None and i - start + 1 >= max_frames:
+            spans.append((start, i + 1))
+            start, silence = None, 0
+    if start is not None:
+        spans.append((start, n))
+
+    pad = pad_ms // frame_ms
+    return [(max(0, a - pad) * frame, min(n, b + pad) * frame) for a, b in spans]
+
+# --- process pool workers ---------------------------------------------------
+
+_model = None
+
+def _init_worker(model_name: str, compute_type: str) -> None:
+    # One model per worker process, single-threaded so cores map to workers
+    global _model
+    from faster_whisper import WhisperModel  # type: ignore
+
+    _model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=1)
+
+def _transcribe_chunk(audio, offset_s: float, language: Optional[str]) -> List[dict]:
+    segments, _ = _model.transcribe(
+        audio, language=language, beam_size=1, vad_filter=False, condition_on_previous_text=False
+    )
+    out = []
+    for seg in segments:
+        text = seg.text.strip()
+        if text:
+            out.append({
+                "text": text,
+                "start": round(offset_s + seg.start, 2),
+                "duration": round(seg.end - seg.start, 2),
+            })
+    return out
+
+def make_pool(workers: int) -> ProcessPoolExecutor:
+    s = get_settings()
+    # Never fork the running server (event loop, httpx pool, threads): start
+    # workers from a clean forkserver process instead
+    return ProcessPoolExecutor(
+        max_workers=max(1, workers),
+        mp_context=multiprocessing.get_context("forkserver"),
+        initializer=_init_worker,
+        initargs=(s.STT_MODEL, s.STT_COMPUTE_TYPE),
+    )
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = make_pool(get_settings().STT_WORKERS)
+    return _pool
+
+async def transcribe_pcm(pcm, *, language: Optional[str] = None, pool: Optional[ProcessPoolExecutor] = None) -> List[dict]:
+    """Transcribe VAD segments of `pcm` in parallel; returns time-ordered segments."""
+    pool = pool or get_pool()
+    loop = asyncio.get_running_loop()
+    spans = vad_segments(pcm)
+    parts = await asyncio.gather(*[
+        loop.run_in_executor(pool, _transcribe_chunk, pcm[a:b], a / SAMPLE_RATE, language)
+        for a, b in spans
+    ])
+    return [seg for part in parts for seg in part]
+
+async def transcribe_video(video_id: str, locale: str = "en") -> List[dict]:
+    """Timestamped transcript segments for a video with no captions."""
+    pcm = await asyncio.to_thread(video_pcm, video_id)
+    language = (locale or "").split("-")[0] or None
+    segments = await transcribe_pcm(pcm, language=language)
+    logger.info("STT transcribed %s: %.0fs audio, %d segments", video_id, len(pcm) / SAMPLE_RATE, len(segments))
+    return segments
@@ -1,11 +1,26 @@
 # claimlens/services/api/claimlens/youtube.py
-import re
+import re, html, time, logging
+from collections import OrderedDict
 from typing import Optional, List
-import httpx
+import xml.etree.ElementTree as ET
 import asyncio
+from .deps import get_settings
+from .httpclient import get_http
+from .deadline import timeout_for, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
 
 YTI = re.compile(r"(?:v=|/)([A-Za-z0-9_-]{11})(?:[^A-Za-z0-9_-]|$)")
 
+_yt_sem: asyncio.Semaphore | None = None
+
+def _yt_limiter() -> asyncio.Semaphore:
+    """Caps concurrent requests to YouTube across all analyses."""
+    global _yt_sem
+    if _yt_sem is None:
+        _yt_sem = asyncio.Semaphore(get_settings().YT_CONCURRENCY)
+    return _yt_sem
+
 def extract_video_id(url: str) -> Optional[str]:
     m = YTI.search(url or "")
     return m.group(1) if m else None
@@ -17,58 +32,151 @@ async def video_meta(video_id: str) -> dict:
     """
     oembed = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
     thumb = f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
-    async with httpx.AsyncClient(timeout=15) as cx:
-        r = await cx.get(oembed)
-        r.raise_for_status()
-        j = r.json()
-        return {
-            "id": video_id,
-            "title": j.get("title", "YouTube Video"),
-            "channel": j.get("author_name", "YouTube"),
-            "thumbnail": thumb,
-            "durationSec": 0,
-        }
-
-def _fetch_transcript_sync(video_id: str, preferred_langs: Optional[List[str]] = None) -> str:
+    async with _yt_limiter():
+        r = await get_http().get(oembed, timeout=timeout_for(15))
+    r.raise_for_status()
+    j = r.json()
+    return {
+        "id": video_id,
+        "title": j.get("title", "YouTube Video"),
+        "channel": j.get("author_name", "YouTube"),
+        "thumbnail": thumb,
+        "durationSec": 0,
+    }
+
+# --- captions ----------------------------------------------------------------
+#
+# Same protocol youtube-transcript-api uses, but async on the shared httpx pool:
+# one innertube `player` call lists the caption tracks, then the chosen track's
+# timedtext URL is fetched directly.
+
+_WATCH_URL = "https://www.youtube.com/watch?v={video_id}"
+_PLAYER_URL = "https://www.youtube.com/youtubei/v1/player?key={key}"
+_INNERTUBE_CONTEXT = {"client": {"clientName": "ANDROID", "clientVersion": "20.10.38"}}
+_HEADERS = {"Accept-Language": "en-US", "Cookie": "CONSENT=YES+cb"}
+_API_KEY_RE = re.compile(r'"INNERTUBE_API_KEY":\s*"([a-zA-Z0-9_-]+)"')
+
+class CaptionFetchError(Exception):
+    """Captions couldn't be listed or downloaded (network, YouTube error, expired link)."""
+
+_innertube_key: str | None = None
+_tracks_cache: "OrderedDict[str, tuple[float, list[dict]]]" = OrderedDict()
+_TRACKS_CACHE_MAX = 2048
+
+async def _get_innertube_key(video_id: str) -> str:
+    # Configured, or scraped from a watch page once per process
+    global _innertube_key
+    if _innertube_key is None:
+        key = get_settings().YT_INNERTUBE_KEY
+        if not key:
+            r = await get_http().get(_WATCH_URL.format(video_id=video_id), headers=_HEADERS, timeout=timeout_for(15))
+            r.raise_for_status()
+            m = _API_KEY_RE.search(r.text)
+            if not m:
+                raise RuntimeError("INNERTUBE_API_KEY not found on watch page")
+            key = m.group(1)
+        _innertube_key = key
+    return _innertube_key
+
+async def caption_tracks(video_id: str) -> List[dict]:
     """
-    Synchronous helper using youtube-transcript-api >= 1.2.x.
-    Tries preferred languages first, then any available transcript.
-    Returns a single plain-text string (no HTML).
+    Available caption tracks for a video ([] if none), from one listing
+    request and cached for YT_TRACKS_TTL_S. Each track has baseUrl,
+    languageCode and kind ("asr" for auto-generated). The baseUrls are
+    signed and can expire before the TTL; transcript_segments() evicts the
+    entry when a fetch fails.
     """
-    from youtube_transcript_api import YouTubeTranscriptApi  # type: ignore
+    ttl = get_settings().YT_TRACKS_TTL_S
+    hit = _tracks_cache.get(video_id)
+    if hit and time.monotonic() - hit[0] < ttl:
+        _tracks_cache.move_to_end(video_id)
+        return hit[1]
 
-    preferred_langs = preferred_langs or ["en", "en-US", "en-GB"]
+    async with _yt_limiter():
+        key = await _get_innertube_key(video_id)
+        r = await get_http().post(
+            _PLAYER_URL.format(key=key),
+            json={"context": _INNERTUBE_CONTEXT, "videoId": video_id},
+            headers=_HEADERS,
+            timeout=timeout_for(15),
+        )
+    r.raise_for_status()
+    tracks = (
+        r.json().get("captions", {})
+        .get("playerCaptionsTracklistRenderer", {})
+        .get("captionTracks", [])
+    )
 
-    ytt = YouTubeTranscriptApi()
+    _tracks_cache[video_id] = (time.monotonic(), tracks)
+    _tracks_cache.move_to_end(video_id)
+    while len(_tracks_cache) > _TRACKS_CACHE_MAX:
+        _tracks_cache.popitem(last=False)
+    return tracks
 
-    # 1) Try a preferred language first
-    try:
-        fetched = ytt.fetch(video_id, languages=preferred_langs)
-        # fetched is a FetchedTranscript (iterable of snippets)
-        return " ".join(snippet.text for snippet in fetched if getattr(snippet, "text", ""))
-    except Exception:
-        pass
+def pick_track(tracks: List[dict], preferred_langs: List[str]) -> Optional[dict]:
+    """Preferred language manual, then generated, then any manual, then anything."""
+    manual = [t for t in tracks if t.get("kind") != "asr"]
+    generated = [t for t in tracks if t.get("kind") == "asr"]
+    for pool in (manual, generated):
+        for lang in preferred_langs:
+            for t in pool:
+                if t.get("languageCode") == lang:
+                    return t
+    return (manual or generated or [None])[0]
 
-    # 2) Otherwise, list transcripts and pick the first available
-    try:
-        transcript_list = ytt.list(video_id)  # TranscriptList
-        # Prefer manually created, else generated, else any
-        try:
-            tr = transcript_list.find_manually_created_transcript(preferred_langs)
-        except Exception:
-            try:
-                tr = transcript_list.find_generated_transcript(preferred_langs)
-            except Exception:
-                # fall back to any transcript in the list
-                tr = next(iter(transcript_list))
-        fetched = tr.fetch()
-        return " ".join(snippet.text for snippet in fetched if getattr(snippet, "text", ""))
-    except Exception:
-        # No transcripts (e.g., Shorts, captions disabled)
-        return ""
+def _parse_timedtext(xml_text: str) -> List[dict]:
+    root = ET.fromstring(xml_text)
+    out = []
+    # Legacy format: <transcript><text start="s" dur="s">
+    for el in root.iter("text"):
+        text = html.unescape("".join(el.itertext())).strip()
+        if text:
+            out.append({
+                "text": text,
+                "start": float(el.get("start", 0)),
+                "duration": float(el.get("dur", 0)),
+            })
+    if out:
+        return out
+    # srv3 format: <timedtext><body><p t="ms" d="ms">
+    for el in root.iter("p"):
+        text = html.unescape("".join(el.itertext())).strip()
+        if text:
+            out.append({
+                "text": text,
+                "start": int(el.get("t", 0)) / 1000,
+                "duration": int(el.get("d", 0)) / 1000,
+            })
+    return out
 
-async def transcript_text(video_id: str) -> str:
+async def transcript_segments(video_id: str, preferred_langs: Optional[List[str]] = None) -> List[dict]:
     """
-    Async wrapper so our FastAPI pipeline doesn’t block the event loop.
+    Timestamped caption segments {"text", "start", "duration"}.
+    Returns [] when the video has no captions (e.g., Shorts, captions disabled)
+    and raises CaptionFetchError when they exist but couldn't be fetched.
     """
-    return await asyncio.to_thread(_fetch_transcript_sync, video_id, ["en", "en-US", "en-GB"])
+    preferred_langs = preferred_langs or ["en", "en-US", "en-GB"]
+    for attempt in range(2):
+        try:
+            track = pick_track(await caption_tracks(video_id), preferred_langs)
+            if not track or not track.get("baseUrl"):
+                return []
+            url = track["baseUrl"].replace("&fmt=srv3", "")
+            async with _yt_limiter():
+                r = await get_http().get(url, headers=_HEADERS, timeout=timeout_for(15))
+            r.raise_for_status()
+            return _parse_timedtext(r.text)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # Likely an expired baseUrl: drop the cached listing and list again once
+            _tracks_cache.pop(video_id, None)
+            logger.warning(f"Transcript fetch failed for {video_id} (attempt {attempt + 1}): {e}")
+            if attempt:
+                raise CaptionFetchError(f"Couldn't fetch captions for {video_id}; retry later") from e
+    return []
+
+async def transcript_text(video_id: str) -> str:
+    """Plain-text transcript (no HTML), or "" if the video has no captions; raises CaptionFetchError."""
+    segments = await transcript_segments(video_id, ["en", "en-US", "en-GB"])
+    return " ".join(seg["text"] for seg in segments)
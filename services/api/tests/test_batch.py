@@ -0,0 +1,20 @@
+from claimlens.batch import ClaimIndex
+
+def test_near_duplicates_share_a_key():
+    index = ClaimIndex(0.85)
+    a = index.canonical("The senator raised taxes by 5 percent in 2020")
+    assert index.canonical("the Senator raised taxes by 5 percent, in 2020!") == a
+    assert index.canonical("The senator raised the taxes by 5 percent in 2020") == a
+
+def test_different_numbers_are_not_merged():
+    index = ClaimIndex(0.5)
+    a = index.canonical("The senator raised taxes by 5 percent in 2020")
+    assert index.canonical("The senator raised taxes by 50 percent in 2020") != a
+    assert index.canonical("The senator raised taxes by 5 percent in 2021") != a
+
+def test_negated_claims_are_not_merged():
+    index = ClaimIndex(0.5)
+    a = index.canonical("The vaccine causes autism in children")
+    assert index.canonical("The vaccine never causes autism in children") != a
+    b = index.canonical("The vaccine does not cause autism in children")
+    assert index.canonical("The vaccine does not cause autism in young children") == b
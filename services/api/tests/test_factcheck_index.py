@@ -0,0 +1,78 @@
+import contextlib
+import fcntl
+import heapq
+import json
+import math
+import random
+import httpx
+import pytest
+from claimlens import factcheck_index
+from claimlens.factcheck_index import FactCheckIndex, build_index, iter_records, _K1
+from claimlens.report_search import tokenize
+
+WORDS = [f"w{i}" for i in range(400)]
+
+def claim(rnd: random.Random, n: int) -> str:
+    return " ".join(rnd.choices(WORDS, weights=[1 / (i + 1) for i in range(len(WORDS))], k=n))
+
+def exhaustive(idx: FactCheckIndex, query: str, k: int, min_match: float) -> list:
+    """Score every posting of every query term, without pruning."""
+    n, scores, matched, total = idx.n_docs, {}, {}, 0.0
+    for term in dict.fromkeys(tokenize(query)):
+        off, df = idx._lookup(term)
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        total += idf
+        plist = idx._postings[off * 2:(off + df) * 2].tolist()
+        for d, tf in zip(plist[::2], plist[1::2]):
+            scores[d] = scores.get(d, 0.0) + idf * tf * (_K1 + 1) / (tf + idx._docnorm[d])
+            matched[d] = matched.get(d, 0.0) + idf
+    good = ((s, d) for d, s in scores.items() if matched[d] / total >= min_match)
+    return [(s, idx.doc(d)) for s, d in heapq.nlargest(k, good)]
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    rnd = random.Random(3)
+    records = [{"text": claim(rnd, rnd.randint(4, 16)), "url": f"https://fc.test/{i}", "rating": "False"}
+               for i in range(3000)]
+    path = str(tmp_path_factory.mktemp("fc") / "factcheck.idx")
+    build_index(records, path)
+    idx = FactCheckIndex(path)
+    yield idx, records, rnd
+    idx.close()
+
+def test_pruned_search_matches_exhaustive_scoring(index):
+    idx, records, rnd = index
+    queries = [claim(rnd, rnd.randint(3, 15)) for _ in range(150)]
+    queries += [records[i]["text"] + " w399 unseen" for i in range(0, 3000, 100)]
+    for q in queries:
+        for min_match in (0.0, 0.3, 0.6, 0.9):
+            got = idx.search(q, k=3, min_match=min_match)
+            want = exhaustive(idx, q, 3, min_match)
+            assert [d["url"] for _, d in got] == [d["url"] for _, d in want], (q, min_match)
+            assert [round(s, 9) for s, _ in got] == [round(s, 9) for s, _ in want]
+
+def test_iter_records_reads_the_fact_check_tools_shape():
+    api = {"claims": [{"text": "c", "claimReview": [{"url": "u", "publisher": {"name": "p"}, "textualRating": "False"}]}]}
+    assert list(iter_records(api)) == [{"text": "c", "url": "u", "publisher": "p", "rating": "False"}]
+
+def test_refresh_streams_the_feed_and_skips_when_locked(tmp_path, monkeypatch):
+    feed = "\n".join(json.dumps({"claimReviewed": f"claim number {i}", "url": f"u{i}"}) for i in range(50))
+    transport = httpx.MockTransport(lambda req: httpx.Response(200, content=feed.encode()))
+
+    @contextlib.contextmanager
+    def stream(method, url, **kw):
+        kw.pop("follow_redirects", None)
+        with httpx.Client(transport=transport) as c, c.stream(method, url, **kw) as r:
+            yield r
+    monkeypatch.setattr(httpx, "stream", stream)
+
+    path = str(tmp_path / "factcheck.idx")
+    assert factcheck_index.refresh("https://feed.test/claims.jsonl", path) == 50
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["factcheck.idx", "factcheck.idx.lock"]
+    idx = FactCheckIndex(path)
+    assert idx.search("claim number 7", k=1)[0][1]["url"] == "u7"
+    idx.close()
+
+    with open(path + ".lock", "w") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        assert factcheck_index.refresh("https://feed.test/claims.jsonl", path) is None
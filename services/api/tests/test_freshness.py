@@ -0,0 +1,85 @@
+import asyncio
+import sys
+import types
+import pytest
+from claimlens import freshness, openai_client
+from claimlens.deps import get_settings
+from claimlens.models import AnalyzeResponse
+
+ROW = {"id": "r1", "video_id": "abcdefghijk", "data": {"meta": {"model": "old"}}}
+
+def report(model: str) -> AnalyzeResponse:
+    return AnalyzeResponse(
+        video={"id": "abcdefghijk", "title": "t", "channel": "c",
+               "thumbnail": "https://i.ytimg.com/vi/abcdefghijk/hqdefault.jpg", "durationSec": 0},
+        consensus={"rating": "mixed", "summary": "s"},
+        claims=[], meta={"model": model}, videoSummary="v",
+    )
+
+@pytest.fixture
+def env(monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "MODEL_PRIMARY", "primary")
+    monkeypatch.setattr(openai_client, "_breakers", {})
+    monkeypatch.setattr(freshness, "_refresh_sem", None)
+    monkeypatch.setattr(freshness, "_inflight", {})
+    monkeypatch.setattr(freshness, "index_report", lambda *a, **k: None)
+    calls = {"pipeline": 0, "updates": []}
+
+    async def update(report_id, data):
+        calls["updates"].append(data["meta"]["model"])
+        return True
+    monkeypatch.setattr(freshness.persistence.queue, "update", update)
+    return calls
+
+def test_refresh_skipped_while_primary_breaker_is_open(env, monkeypatch):
+    b = openai_client.get_breaker("primary")
+    for _ in range(b.threshold):
+        b.failure()
+
+    async def pipeline(req):
+        env["pipeline"] += 1
+        return report("primary")
+    monkeypatch.setattr(freshness, "run_pipeline", pipeline)
+    asyncio.run(freshness._refresh(ROW, "model"))
+    assert env["pipeline"] == 0 and env["updates"] == []
+
+def test_fallback_result_is_not_persisted(env, monkeypatch):
+    async def pipeline(req):
+        return report("fallback")
+    monkeypatch.setattr(freshness, "run_pipeline", pipeline)
+    asyncio.run(freshness._refresh(ROW, "model"))
+    assert env["updates"] == []
+
+    async def primary(req):
+        return report("primary")
+    monkeypatch.setattr(freshness, "run_pipeline", primary)
+    asyncio.run(freshness._refresh(ROW, "model"))
+    assert env["updates"] == ["primary"]
+
+def test_bulk_reanalysis_waits_for_inflight_refreshes(env, monkeypatch):
+    monkeypatch.setattr(get_settings(), "REFRESH_CONCURRENCY", 2)
+    rows = [{"id": f"r{i}", "video_id": f"v{i:010d}", "data": {"meta": {"model": "old"}}} for i in range(6)]
+
+    async def get_saved_reports(limit, offset):
+        return {"reports": rows[offset:offset + limit], "has_more": offset + limit < len(rows)}
+    fake_db = types.ModuleType("claimlens.db")
+    fake_db.db = types.SimpleNamespace(get_saved_reports=get_saved_reports)
+    monkeypatch.setitem(sys.modules, "claimlens.db", fake_db)
+    monkeypatch.setattr(freshness, "staleness", lambda row: "model")
+
+    peak = 0
+    async def pipeline(req):
+        nonlocal peak
+        peak = max(peak, len(freshness._inflight))
+        await asyncio.sleep(0.01)
+        return report("primary")
+    monkeypatch.setattr(freshness, "run_pipeline", pipeline)
+
+    async def run():
+        out = await freshness.reanalyze_outdated(per_min=600_000, page_size=4)
+        await asyncio.gather(*freshness._inflight.values())
+        return out
+    assert asyncio.run(run()) == (6, 6)
+    assert peak <= 2
+    assert len(env["updates"]) == 6
@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+from claimlens import openai_client
+from claimlens.deps import get_settings
+from claimlens.openai_client import CircuitBreaker, OpenAIError, RetryableOpenAIError
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(openai_client.time, "monotonic", c.monotonic)
+    return c
+
+@pytest.fixture
+def settings(monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(s, "MODEL_PRIMARY", "primary")
+    monkeypatch.setattr(s, "MODEL_FALLBACK", "fallback")
+    monkeypatch.setattr(s, "OPENAI_MAX_RETRIES", 0)
+    monkeypatch.setattr(openai_client, "_breakers", {})
+    return s
+
+def open_breaker(clock, threshold=2, reset_after_s=30) -> CircuitBreaker:
+    b = CircuitBreaker("m", "chat", threshold, reset_after_s)
+    for _ in range(threshold):
+        assert b.allow()
+        b.failure()
+    assert b.state == CircuitBreaker.OPEN
+    return b
+
+def test_opens_after_threshold_and_fails_fast(clock):
+    b = open_breaker(clock)
+    assert not b.allow()
+    clock.now += 29
+    assert not b.allow()
+
+def test_half_open_allows_a_single_probe(clock):
+    b = open_breaker(clock)
+    clock.now += 30
+    assert b.allow()
+    assert b.state == CircuitBreaker.HALF_OPEN
+    assert not b.allow()
+
+def test_probe_success_closes(clock):
+    b = open_breaker(clock)
+    clock.now += 30
+    assert b.allow()
+    b.success()
+    assert b.state == CircuitBreaker.CLOSED
+    assert b.allow() and b.allow()
+
+def test_probe_failure_reopens(clock):
+    b = open_breaker(clock)
+    clock.now += 30
+    assert b.allow()
+    b.failure()
+    assert b.state == CircuitBreaker.OPEN
+    assert not b.allow()
+
+def test_abandoned_probe_lets_another_through(clock):
+    b = open_breaker(clock)
+    clock.now += 30
+    assert b.allow()
+    b.abandon()
+    assert b.state == CircuitBreaker.HALF_OPEN
+    assert b.allow()
+
+def test_probe_that_never_reports_expires(clock):
+    b = open_breaker(clock)
+    clock.now += 30
+    assert b.allow()
+    clock.now += 29
+    assert not b.allow()
+    clock.now += 1
+    assert b.allow()
+
+def _half_open(clock, model: str) -> CircuitBreaker:
+    b = openai_client.get_breaker(model)
+    for _ in range(b.threshold):
+        b.failure()
+    clock.now += b.reset_after_s
+    return b
+
+def test_non_retryable_error_ends_the_probe(clock, settings, monkeypatch):
+    b = _half_open(clock, "primary")
+
+    async def fail(payload):
+        raise OpenAIError("OpenAI 401 Unauthorized")
+    monkeypatch.setattr(openai_client, "_hedged", fail)
+
+    with pytest.raises(OpenAIError):
+        asyncio.run(openai_client.chat("sys", "user"))
+    assert b.state == CircuitBreaker.OPEN
+    clock.now += b.reset_after_s
+    assert b.allow()  # not locked out
+
+def test_non_retryable_errors_do_not_open_a_closed_breaker(clock, settings, monkeypatch):
+    b = openai_client.get_breaker("primary")
+
+    async def fail(payload):
+        raise OpenAIError("OpenAI 400 Bad Request")
+    monkeypatch.setattr(openai_client, "_hedged", fail)
+
+    for _ in range(b.threshold + 1):
+        with pytest.raises(OpenAIError):
+            asyncio.run(openai_client.chat("sys", "user"))
+    assert b.state == CircuitBreaker.CLOSED
+    assert b.failures == 0
+
+def test_cancelled_probe_is_released(clock, settings, monkeypatch):
+    b = _half_open(clock, "primary")
+
+    async def hang(payload):
+        await asyncio.sleep(3600)
+    monkeypatch.setattr(openai_client, "_hedged", hang)
+
+    async def run():
+        # e.g. within_deadline() giving up; the fake clock freezes loop timers, so cancel directly
+        task = asyncio.create_task(openai_client.chat("sys", "user"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(run())
+    assert b.state == CircuitBreaker.HALF_OPEN
+    assert b.allow()
+
+def test_fallback_answer_is_recorded(clock, settings, monkeypatch):
+    async def answer(payload):
+        if payload["model"] == "primary":
+            raise RetryableOpenAIError("OpenAI 503")
+        return "ok", {"prompt_tokens": 3, "completion_tokens": 1}
+    monkeypatch.setattr(openai_client, "_hedged", answer)
+
+    async def run():
+        usage = openai_client.track_usage()
+        assert await openai_client.chat("sys", "user", stage="verify") == "ok"
+        return usage
+    usage = asyncio.run(run())
+    assert usage["verify"]["models"] == {"fallback": 1}
+    assert openai_client.answered_model(usage) == "fallback"
+    assert openai_client.answered_model({"verify": {"models": {"primary": 2}}}) == "primary"
@@ -0,0 +1,88 @@
+import asyncio
+import sys
+import types
+import pytest
+from claimlens import persistence
+from claimlens.deps import get_settings
+
+def report(video_id: str, summary: str) -> dict:
+    return {"video": {"id": video_id}, "videoSummary": summary}
+
+class FakeDB:
+    """Blocking upsert like the Supabase client; `gate` holds a write in flight."""
+    def __init__(self) -> None:
+        self.rows: dict = {}
+        self.gate: asyncio.Event | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.fail = False
+
+    def upsert_reports(self, rows):
+        if self.gate is not None:
+            asyncio.run_coroutine_threadsafe(self.gate.wait(), self.loop).result()
+        if self.fail:
+            raise ConnectionError("database down")
+        for row in rows:
+            self.rows[row["id"]] = row
+
+    async def delete_report(self, report_id):
+        return self.rows.pop(report_id, None) is not None
+
+    async def update_report(self, report_id, data):
+        if report_id not in self.rows:
+            return False
+        self.rows[report_id] = {**self.rows[report_id], "data": data}
+        return True
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    fake = FakeDB()
+    module = types.ModuleType("claimlens.db")
+    module.db = fake
+    monkeypatch.setitem(sys.modules, "claimlens.db", module)
+    s = get_settings()
+    monkeypatch.setattr(s, "REDIS_URL", "")
+    monkeypatch.setattr(s, "PERSIST_SPILL_PATH", str(tmp_path / "spill.jsonl"))
+    monkeypatch.setattr(s, "PERSIST_MAX_RETRIES", 0)
+    return fake
+
+def test_save_for_the_same_video_keeps_the_newest_data(db):
+    q = persistence.WriteBehindQueue()
+    first = q.save(report("abcdefghijk", "old"))
+    second = q.save(report("abcdefghijk", "new"))
+    assert first == second
+    assert q.get(first)["data"]["videoSummary"] == "new"
+    asyncio.run(q.flush())
+    assert db.rows[first]["data"]["videoSummary"] == "new"
+
+def test_discard_during_flush_deletes_the_row_afterwards(db):
+    q = persistence.WriteBehindQueue()
+
+    async def run():
+        db.loop, db.gate = asyncio.get_running_loop(), asyncio.Event()
+        rid = q.save(report("abcdefghijk", "s"))
+        flushing = asyncio.create_task(q.flush())
+        while rid not in q._writing:
+            await asyncio.sleep(0)
+        # DELETE /saved-reports/{id} while the upsert is in flight
+        assert q.discard(rid)
+        assert not await db.delete_report(rid)
+        assert not await q.update(rid, report("abcdefghijk", "late refresh"))
+        db.gate.set()
+        await flushing
+        return rid
+    rid = asyncio.run(run())
+    assert rid not in db.rows
+    assert not q._tombstones
+
+def test_unflushed_reports_survive_a_restart_via_the_file_spill(db):
+    db.fail = True
+    q = persistence.WriteBehindQueue()
+    rid = q.save(report("abcdefghijk", "s"))
+    assert asyncio.run(q.flush()) == 0
+
+    db.fail = False
+    recovered = persistence.WriteBehindQueue()
+    asyncio.run(recovered._load_spill())
+    assert recovered.get(rid)["data"]["videoSummary"] == "s"
+    assert asyncio.run(recovered.flush()) == 1
+    assert rid in db.rows
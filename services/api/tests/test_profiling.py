@@ -0,0 +1,21 @@
+import tracemalloc
+from claimlens import profiling
+
+def test_tracing_stops_only_after_the_last_overlapping_profile():
+    assert not tracemalloc.is_tracing()
+    profiling._start_tracing(1)
+    profiling._start_tracing(1)   # second profiled request overlaps the first
+    profiling._stop_tracing()     # first one finishes
+    assert tracemalloc.is_tracing()
+    tracemalloc.take_snapshot()   # the second can still snapshot
+    profiling._stop_tracing()
+    assert not tracemalloc.is_tracing()
+
+def test_tracing_started_elsewhere_is_left_running():
+    tracemalloc.start()
+    try:
+        profiling._start_tracing(1)
+        profiling._stop_tracing()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
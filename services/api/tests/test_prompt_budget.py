@@ -0,0 +1,28 @@
+import pytest
+from claimlens import prompt_budget
+
+@pytest.fixture
+def no_tiktoken(monkeypatch):
+    calls = []
+
+    def unavailable(name):
+        calls.append(name)
+        raise ConnectionError("no network")
+    monkeypatch.setattr(prompt_budget.tiktoken, "encoding_for_model", unavailable)
+    monkeypatch.setattr(prompt_budget, "_encoders", {})
+    monkeypatch.setattr(prompt_budget, "_encoder_failed_at", None)
+    return calls
+
+def test_falls_back_to_a_length_estimate(no_tiktoken):
+    assert prompt_budget.count_tokens("x" * 10, "m") == 3
+    assert prompt_budget.count_tokens("", "m") == 0
+    assert prompt_budget.truncate_tokens("short", 5, "m") == "short"
+    assert prompt_budget.truncate_tokens("word " * 20, 3, "m") == "word word w…"
+
+def test_failed_load_is_not_retried_on_every_call(no_tiktoken, monkeypatch):
+    for _ in range(5):
+        prompt_budget.count_tokens("text", "m")
+    assert no_tiktoken == ["m"]
+    monkeypatch.setattr(prompt_budget, "_encoder_failed_at", prompt_budget._encoder_failed_at - prompt_budget._ENCODER_RETRY_S)
+    prompt_budget.count_tokens("text", "m")
+    assert no_tiktoken == ["m", "m"]
@@ -0,0 +1,92 @@
+import math
+import random
+import pytest
+from claimlens.report_search import InvertedIndex, round_score, tokenize, _FIELDS, _fields, _K1, _B
+
+WORDS = [f"w{i}" for i in range(300)]
+RATINGS = ["solid", "reliable", "mixed", "doubtful"]
+
+def text(rnd: random.Random, n: int) -> str:
+    # Skewed vocabulary so some terms are in most reports and tiers are big
+    return " ".join(rnd.choices(WORDS, weights=[1 / (i + 1) for i in range(len(WORDS))], k=n))
+
+def report(rnd: random.Random) -> dict:
+    return {
+        "video": {"title": text(rnd, 6), "channel": text(rnd, 2)},
+        "videoSummary": text(rnd, rnd.randint(5, 40)),
+        "consensus": {"summary": text(rnd, 8)},
+        "claims": [{"text": text(rnd, 12), "rating": rnd.choice(RATINGS)} for _ in range(rnd.randint(1, 6))],
+    }
+
+def term_weights(data: dict) -> dict:
+    tf = {}
+    fields = dict(_fields(data))
+    for name, weight in _FIELDS:
+        for tok in tokenize(fields[name]):
+            tf[tok] = tf.get(tok, 0.0) + weight
+    return tf
+
+def brute_force(docs: dict, q: str, rating=None) -> list:
+    """Score every report without pruning, ordered the way search() promises."""
+    tfs = {rid: data["_tf"] for rid, data in docs.items()}
+    n = len(docs)
+    avg = sum(sum(tf.values()) for tf in tfs.values()) / n
+    terms = list(dict.fromkeys(tokenize(q)))
+    df = {t: sum(t in tf for tf in tfs.values()) for t in terms}
+    out = []
+    for rid, tf in tfs.items():
+        if not terms or any(t not in tf for t in terms):
+            continue
+        if rating and rating not in {c["rating"] for c in docs[rid]["claims"]}:
+            continue
+        norm = _K1 * (1 - _B + _B * sum(tf.values()) / avg)
+        score = sum(
+            math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5)) * tf[t] * (_K1 + 1) / (tf[t] + norm) for t in terms
+        )
+        out.append((round_score(score), rid))
+    return sorted(out, reverse=True)
+
+@pytest.fixture(scope="module")
+def corpus():
+    rnd = random.Random(7)
+    docs = {f"r{i:05d}": report(rnd) for i in range(1500)}
+    index = InvertedIndex()
+    for rid, data in docs.items():
+        index.add(rid, data)
+    # Re-indexing and removal must leave the tiers consistent
+    for rid in list(docs)[:200:3]:
+        docs[rid] = report(rnd)
+        index.add(rid, docs[rid])
+    for rid in list(docs)[200:400:5]:
+        index.remove(rid)
+        del docs[rid]
+    for data in docs.values():
+        data["_tf"] = term_weights(data)
+    return index, docs, rnd
+
+def test_pruned_search_matches_brute_force(corpus):
+    index, docs, rnd = corpus
+    queries = ["w0", "w1", "w0 w1", "w2 w0 w5", "w40", "w150 w0", "the w3"]
+    queries += [text(rnd, rnd.randint(1, 3)) for _ in range(40)]
+    for q in queries:
+        for rating in (None, "mixed"):
+            expected = brute_force(docs, q, rating)[:10]
+            got = [(score, row["id"]) for score, row in index.search(q, rating=rating, limit=10)]
+            assert got == expected, q
+
+def test_cursor_pages_match_brute_force(corpus):
+    index, docs, _ = corpus
+    expected = brute_force(docs, "w0 w3")
+    seen, after = [], None
+    while True:
+        page = index.search("w0 w3", limit=25, after=after)
+        if not page:
+            break
+        seen += [(score, row["id"]) for score, row in page]
+        after = seen[-1]
+    assert seen == expected
+
+def test_missing_term_matches_nothing(corpus):
+    index, _, _ = corpus
+    assert index.search("w0 nosuchword") == []
+    assert index.search("") == []
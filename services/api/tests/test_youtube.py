@@ -0,0 +1,49 @@
+import asyncio
+import httpx
+import pytest
+from claimlens import youtube
+from claimlens.deps import get_settings
+
+TIMEDTEXT = '<transcript><text start="0" dur="1.5">hello &amp;amp; welcome</text></transcript>'
+
+@pytest.fixture
+def yt(monkeypatch):
+    """Fake YouTube: player listings hand out numbered baseUrls; `expired` ones 403."""
+    state = {"listings": 0, "expired": set(), "tracks": True}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "/youtubei/v1/player" in request.url.path:
+            state["listings"] += 1
+            tracks = [{"baseUrl": f"https://yt.test/timedtext?v={state['listings']}", "languageCode": "en"}]
+            return httpx.Response(200, json={"captions": {"playerCaptionsTracklistRenderer": {
+                "captionTracks": tracks if state["tracks"] else []}}})
+        if request.url.params["v"] in state["expired"]:
+            return httpx.Response(403)
+        return httpx.Response(200, text=TIMEDTEXT)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(youtube, "get_http", lambda: client)
+    monkeypatch.setattr(youtube, "_tracks_cache", youtube.OrderedDict())
+    monkeypatch.setattr(youtube, "_yt_sem", None)
+    monkeypatch.setattr(get_settings(), "YT_INNERTUBE_KEY", "test-key")
+    monkeypatch.setattr(youtube, "_innertube_key", None)
+    return state
+
+def test_expired_cached_url_is_relisted(yt):
+    async def run():
+        assert await youtube.transcript_text("abcdefghijk") == "hello & welcome"
+        yt["expired"].add("1")
+        return await youtube.transcript_text("abcdefghijk")
+    assert asyncio.run(run()) == "hello & welcome"
+    assert yt["listings"] == 2
+
+def test_fetch_failure_raises_instead_of_looking_like_no_captions(yt):
+    yt["expired"].update({"1", "2"})
+    with pytest.raises(youtube.CaptionFetchError):
+        asyncio.run(youtube.transcript_text("abcdefghijk"))
+    assert yt["listings"] == 2
+    assert "abcdefghijk" not in youtube._tracks_cache
+
+def test_no_captions_is_empty(yt):
+    yt["tracks"] = False
+    assert asyncio.run(youtube.transcript_text("abcdefghijk")) == ""